@@ -1,59 +1,80 @@
 """acs.py Ant Colony System
 """
 from tools.debug import DEBUG
-from random import seed, random, randrange
+from random import Random
 from tests.tsp import DirectedWeightedGraph
+from algs.construction import nearestNeighbor
+from algs.localSearch import LocalSearch, localSearchFor
+from algs.solver import Solver, Termination
+import numpy as np
 
 class _GraphWithPheromone:
-    def __init__(self, dwg:DirectedWeightedGraph) -> None:
-        self.distance = dwg.distance
+    def __init__(self, dwg:DirectedWeightedGraph, beta:float, candidateListSize:int) -> None:
+        self.distance:np.ndarray = dwg.distance
         self.numOfCities = dwg.numOfCities
-        self.pheromone:list[list[float]] = None
+        self.pheromone:np.ndarray = None
+        # lazily computed distances only afford pheromone on candidate edges,
+        # column c of row i then stands for the edge (i, candidates[i, c])
+        self.sparse = not isinstance(dwg.distance, np.ndarray)
+        if self.sparse and candidateListSize <= 0:
+            candidateListSize = dwg.neighbors.shape[1]
+        # nearest neighbors of each city, None to consider all cities
+        self.candidates:np.ndarray = None
+        if candidateListSize > 0:
+            self.candidates = dwg.nearestNeighbors(candidateListSize)
+        # heuristic information eta^beta, fixed during the run
+        with np.errstate(divide="ignore"):
+            if self.sparse:
+                rows = np.arange(self.numOfCities)[:, None]
+                self.heuristic:np.ndarray = (1 / self.distance[rows, self.candidates]) ** beta
+            else:
+                self.heuristic:np.ndarray = (1 / self.distance) ** beta
+                np.fill_diagonal(self.heuristic, 0.0)
+        # choice information tau * eta^beta, refreshed with the pheromone
+        self.choiceInfo:np.ndarray = None
+
+    def edge(self, src:int, dst:int) -> tuple[int, int]:
+        """return the index of edge (src, dst) into pheromone, heuristic and
+        choiceInfo, None for edges off the candidate lists of a sparse graph
+        """
+        if not self.sparse:
+            return src, dst
+        col = np.flatnonzero(self.candidates[src] == dst)
+        return (src, int(col[0])) if len(col) != 0 else None
 
 class _Ant:
-    def __init__(self) -> None:
-        self.toBeVisted:set[int] = set()
-        self.tour:list[int] = []
+    __slots__ = ("visited", "stamp", "tour", "cursor", "tourLength")
+
+    def __init__(self, visited:np.ndarray, tour:np.ndarray) -> None:
+        # city c is visited in the current tour iff visited[c] == stamp
+        self.visited = visited
+        self.stamp:int = 1
+        # preallocated tour buffer, filled up to cursor
+        self.tour = tour
+        self.cursor:int = 0
         self.tourLength:float = 0.0
     
     def reset(self) -> None:
-        self.toBeVisted.clear()
-        self.tour.clear()
+        if self.stamp == np.iinfo(self.visited.dtype).max:
+            self.visited.fill(0)
+            self.stamp = 0
+        self.stamp += 1
+        self.cursor = 0
         self.tourLength:float = 0.0
 
-class AntColonySystem:
-    def run(self) -> None:
-        # initialization phase
-        self._nearestNeighborHeuristic()
-        self.tao0 = 1 / (self.g.numOfCities * self.gBestLength)
-        self.g.pheromone = [[self.tao0 for _ in range(self.g.numOfCities)] for _ in range(self.g.numOfCities)]
-        
-        # main loop
-        for _ in range(self.maxGeneration):
-            # cities to be visited
-            for k in range(self.numberOfAnts):
-                for c in range(self.g.numOfCities):
-                    self.ants[k].toBeVisted.add(c)
-            # select a starting city for ant k
-            for k in range(self.numberOfAnts):
-                self.ants[k].tour.append(randrange(0, self.g.numOfCities))
-                self.ants[k].toBeVisted.discard(self.ants[k].tour[0])
-            # build tours
-            for _ in range(self.g.numOfCities - 1):
-                for k in range(self.numberOfAnts):
-                    self._pseudoRandomProportionalRule(k)
-                # local pheromone updating
-                self._localPheromoneUpdateingRule()
-            # go back to initial point
-            for ant in self.ants:
-                ant.tour.append(ant.tour[0])
-                ant.tourLength += self.g.distance[ant.tour[-2]][ant.tour[-1]]
-            self._localPheromoneUpdateingRule()
-            # global pheromone updating
-            self._globalPheromoneUpdateingRule()
-            # reset the state of ants
-            for ant in self.ants:
-                ant.reset()
+    def visit(self, city:int) -> None:
+        self.tour[self.cursor] = city
+        self.cursor += 1
+        self.visited[city] = self.stamp
+
+    def unvisited(self) -> np.ndarray:
+        return np.flatnonzero(self.visited != self.stamp)
+
+class AntColonySystem(Solver):
+    def run(self, termination:Termination = None) -> None:
+        # main loop, maxGeneration generations unless termination is given
+        for _ in self.iterate(termination):
+            pass
 
         if DEBUG.ON:
             print("--------- ACS ----------")
@@ -69,67 +90,153 @@ class AntColonySystem:
             q0:float = 0.9,
             alpha:float = 0.1,
             rho:float = 0.1,
+            candidateListSize:int = 0,
+            localSearch:str = None,
             rdSeed:float = 0xD5F1306
         ) -> None:
-        
-        # random seed
-        seed(rdSeed)
+        super().__init__()
+        # random seed, every solver owns its random streams
+        self.rd = Random(rdSeed)
         # termination condition
         self.maxGeneration = maxGeneration
         # problem defined
-        self.g = _GraphWithPheromone(graph)
+        self.graph = graph
+        self.g = _GraphWithPheromone(graph, beta, candidateListSize)
         # ants colony
         self.numberOfAnts = numberOfAnts
-        self.ants = [_Ant() for _ in range(self.numberOfAnts)]
+        self.tours = np.empty((self.numberOfAnts, self.g.numOfCities + 1), dtype=np.intp)
+        self.visited = np.zeros((self.numberOfAnts, self.g.numOfCities), dtype=np.uint32)
+        self.ants = [_Ant(self.visited[k], self.tours[k]) for k in range(self.numberOfAnts)]
         # parameter
         self.beta = beta
         self.q0 = q0
         self.alpha = alpha
         self.rho = rho
         self.tao0 = 0.0
+        # None, "best" for the iteration best tour only or "all" tours
+        self.localSearch = localSearch
+        self.improvement:LocalSearch = None
+        if localSearch is not None:
+            self.improvement = localSearchFor(graph)
         # result
         self.gBestTour = []
         self.gBestLength = None
 
+    def _best(self) -> tuple[float, list[int]]:
+        return self.gBestLength, self.gBestTour
+
+    def _state(self) -> dict[str, np.ndarray]:
+        # the ants are reset between generations and need no saving
+        return {
+            "pheromone": self.g.pheromone,
+            "choiceInfo": self.g.choiceInfo,
+            "tao0": np.array(self.tao0),
+            "gBestTour": np.array(self.gBestTour, dtype=np.intp),
+            "gBestLength": np.array(self.gBestLength, dtype=np.float64)
+        }
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        self.g.pheromone = state["pheromone"]
+        self.g.choiceInfo = state["choiceInfo"]
+        self.tao0 = float(state["tao0"])
+        self.gBestTour = state["gBestTour"].tolist()
+        self.gBestLength = state["gBestLength"][()]
+
+    def _initialization(self) -> None:
+        self._nearestNeighborHeuristic()
+        self.tao0 = 1 / (self.g.numOfCities * self.gBestLength)
+        self.g.pheromone = np.full(self.g.heuristic.shape, self.tao0)
+        self.g.choiceInfo = self.g.pheromone * self.g.heuristic
+
+    def _generation(self) -> None:
+        # select a starting city for ant k
+        for k in range(self.numberOfAnts):
+            self.ants[k].visit(self.rd.randrange(0, self.g.numOfCities))
+        # build tours
+        for _ in range(self.g.numOfCities - 1):
+            for k in range(self.numberOfAnts):
+                self._pseudoRandomProportionalRule(k)
+            # local pheromone updating
+            self._localPheromoneUpdateingRule()
+        # go back to initial point
+        for ant in self.ants:
+            ant.visit(ant.tour[0])
+            ant.tourLength += self.g.distance[ant.tour[-2], ant.tour[-1]]
+        self._localPheromoneUpdateingRule()
+        if self.localSearch is not None:
+            self._improveTours()
+        # global pheromone updating
+        self._globalPheromoneUpdateingRule()
+        # reset the state of ants
+        for ant in self.ants:
+            ant.reset()
+
+    def _improveTours(self) -> None:
+        if self.localSearch == "all":
+            ants = self.ants
+        elif self.localSearch == "best":
+            ants = [min(self.ants, key=lambda ant: ant.tourLength)]
+        else:
+            raise ValueError(f"unknown local search scope: {self.localSearch}")
+        for ant in ants:
+            tour = ant.tour[:-1].tolist()
+            ant.tourLength = self.improvement.improve(tour, ant.tourLength)
+            ant.tour[:-1] = tour
+            ant.tour[-1] = tour[0]
+
+    def immigrate(self, tour:list[int], tourLength:float) -> None:
+        """adopt a closed tour from another colony if it beats the global
+        best, its global deposit is applied right away
+        """
+        if tourLength < self.gBestLength:
+            self.gBestTour = list(tour)
+            self.gBestLength = tourLength
+            self._depositgBest()
+
     def _pseudoRandomProportionalRule(self, curAnt:int) -> None:
         ant = self.ants[curAnt]
-        curCity = ant.tour[-1]
-        q = random()
-        temp = []
-        for nextCity in ant.toBeVisted:
-            temp.append([
-                    nextCity,
-                    (self.g.pheromone[curCity][nextCity]) * ((1 / self.g.distance[curCity][nextCity]) ** self.beta)
-                ])
+        curCity = ant.tour[ant.cursor - 1]
+        exploit = self.rd.random() <= self.q0
+        candidates, weights = self._unvisitedCandidates(ant, curCity)
         
-        if q <= self.q0:
-            idx = 0
-            for i in range(len(temp)):
-                if temp[i][1] > temp[idx][1]:
-                    idx = i
-            ant.tour.append(temp[idx][0])
-            ant.tourLength += self.g.distance[curCity][ant.tour[-1]]
-            ant.toBeVisted.discard(ant.tour[-1])
+        if len(candidates) == 0:
+            # every nearest neighbor is visited, move to the best unvisited city
+            candidates = ant.unvisited()
+            if self.g.sparse:
+                # edges off the candidate lists keep tao0, the best is the closest
+                nextCity = candidates[self.g.distance[curCity, candidates].argmin()]
+            else:
+                nextCity = candidates[self.g.choiceInfo[curCity][candidates].argmax()]
+        elif exploit:
+            nextCity = candidates[weights.argmax()]
         else:
-            total = 0.0
-            for i in range(len(temp)):
-                total += temp[i][1]
-            p = [[temp[i][0], temp[i][1] / total] for i in range(len(temp))]
-            s = random()
-            pSum = 0.0
-            for i in range(len(p)):
-                pSum += p[i][1]
-                if pSum >= s:
-                    ant.tour.append(p[i][0])
-                    ant.tourLength += self.g.distance[curCity][ant.tour[-1]]
-                    ant.toBeVisted.discard(ant.tour[-1])
-                    break
+            cumulative = np.cumsum(weights)
+            idx = np.searchsorted(cumulative, self.rd.random() * cumulative[-1])
+            nextCity = candidates[min(idx, len(candidates) - 1)]
+        ant.visit(nextCity)
+        ant.tourLength += self.g.distance[curCity, nextCity]
+
+    def _unvisitedCandidates(self, ant:_Ant, curCity:int) -> tuple[np.ndarray, np.ndarray]:
+        """return the unvisited cities in the candidate list of curCity,
+        or every unvisited city when no candidate list is used, with their
+        choice information
+        """
+        if self.g.candidates is None:
+            candidates = ant.unvisited()
+            return candidates, self.g.choiceInfo[curCity][candidates]
+        candidates = self.g.candidates[curCity]
+        cols = np.flatnonzero(ant.visited[candidates] != ant.stamp)
+        if self.g.sparse:
+            return candidates[cols], self.g.choiceInfo[curCity, cols]
+        return candidates[cols], self.g.choiceInfo[curCity][candidates[cols]]
 
     def _localPheromoneUpdateingRule(self) -> None:
         for ant in self.ants:
-            srcCity = ant.tour[-2]
-            dstCity = ant.tour[-1]
-            self.g.pheromone[srcCity][dstCity] = (1 - self.rho) * self.g.pheromone[srcCity][dstCity] + self.rho * self.tao0
+            e = self.g.edge(ant.tour[ant.cursor - 2], ant.tour[ant.cursor - 1])
+            if e is None:
+                continue
+            self.g.pheromone[e] = (1 - self.rho) * self.g.pheromone[e] + self.rho * self.tao0
+            self.g.choiceInfo[e] = self.g.pheromone[e] * self.g.heuristic[e]
 
     def _globalPheromoneUpdateingRule(self) -> None:
         bestAntIdx = 0
@@ -139,42 +246,25 @@ class AntColonySystem:
                 bestAntIdx = k
         # compare with the global best
         if self.ants[bestAntIdx].tourLength < self.gBestLength:
-            self.gBestTour = [c for c in self.ants[bestAntIdx].tour]
+            self.gBestTour = self.ants[bestAntIdx].tour.tolist()
             self.gBestLength = self.ants[bestAntIdx].tourLength
+        self._depositgBest()
+
+    def _depositgBest(self) -> None:
         # update pheromone
         for i in range(len(self.gBestTour) - 1):
-            src = self.gBestTour[i]
-            dst = self.gBestTour[i + 1]
-            self.g.pheromone[src][dst] = (1 - self.alpha) * self.g.pheromone[src][dst] + self.alpha * (1 / self.gBestLength)
+            e = self.g.edge(self.gBestTour[i], self.gBestTour[i + 1])
+            if e is None:
+                continue
+            self.g.pheromone[e] = (1 - self.alpha) * self.g.pheromone[e] + self.alpha * (1 / self.gBestLength)
+            self.g.choiceInfo[e] = self.g.pheromone[e] * self.g.heuristic[e]
         
     def _nearestNeighborHeuristic(self) -> None:
         """return the tour length produced by the nearest neighbor heuristic
         """
-        visited = []
-        unvisited = {c for c in range(self.g.numOfCities)}
-
-        visited.append(randrange(0, self.g.numOfCities))
-        unvisited.discard(visited[0])
-        tourLength = 0.0
-        while len(unvisited) != 0:
-            nextCity = None
-            minLength = None
-            for c in unvisited:
-                if nextCity == None:
-                    nextCity = c
-                    minLength = self.g.distance[visited[-1]][nextCity]
-                else:
-                    length = self.g.distance[visited[-1]][c]
-                    if length < minLength:
-                        nextCity = c
-                        minLength = length
-            visited.append(nextCity)
-            unvisited.discard(nextCity)
-            tourLength += minLength
-        tourLength += self.g.distance[visited[-1]][visited[0]]
-        visited.append(visited[0])
-
-        self.gBestTour = [c for c in visited]
+        tour, tourLength = nearestNeighbor(self.graph, self.rd.randrange(0, self.g.numOfCities))
+        self.gBestTour = tour.tolist()
+        self.gBestTour.append(self.gBestTour[0])
         self.gBestLength = tourLength
     
         if DEBUG.ON:
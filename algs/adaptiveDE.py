@@ -0,0 +1,212 @@
+"""adaptiveDE.py Differential Evolution with parameter adaptation, JADE and SHADE
+"""
+from algs.de import DifferentialEvolution
+from tests.functions import Function
+from tools.evaluator import Evaluator
+import numpy as np
+
+class JADE(DifferentialEvolution):
+    def __init__(
+            self,
+            objectFunction:Function,
+            populationSize:int,
+            p:float = 0.05,
+            c:float = 0.1,
+            archiveRate:float = 1.0,
+            maxGeneration:int = 1000,
+            targetVal:float = None,
+            evaluator:Evaluator = None,
+            rdSeed:float = 0xD5F1306
+        ) -> None:
+        """current-to-pbest/1/bin with an external archive, F and CR are
+        sampled per individual around adaptive means
+        """
+        super().__init__(
+            objectFunction,
+            populationSize,
+            maxGeneration=maxGeneration,
+            generational=True,
+            targetVal=targetVal,
+            evaluator=evaluator,
+            rdSeed=rdSeed
+        )
+        # parameter
+        self.p = p
+        self.c = c
+        self.muF = 0.5
+        self.muCR = 0.5
+        # archive of replaced parents, full rows are evicted at random
+        self.archive = np.empty((round(archiveRate * self.popSize), self.dim))
+        self.archiveSize:int = 0
+
+    def _state(self) -> dict[str, np.ndarray]:
+        state = super()._state()
+        state.update(
+            muF=np.array(self.muF),
+            muCR=np.array(self.muCR),
+            archive=self.archive,
+            archiveSize=np.array(self.archiveSize)
+        )
+        return state
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        super()._setState(state)
+        self.muF = state["muF"][()]
+        self.muCR = state["muCR"][()]
+        self.archive = state["archive"]
+        self.archiveSize = int(state["archiveSize"])
+
+    def _sampleParameters(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """return F, CR and the greedy rate p of every individual
+        """
+        F = self._cauchy(np.full(self.popSize, self.muF))
+        CR = np.clip(self.rng.normal(self.muCR, 0.1, size=self.popSize), 0.0, 1.0)
+        return F, CR, np.full(self.popSize, self.p)
+
+    def _adaptParameters(self, F:np.ndarray, CR:np.ndarray, improvement:np.ndarray) -> None:
+        """move the means towards the parameters of the successful trials
+        """
+        if len(F) == 0:
+            return
+        self.muCR = (1 - self.c) * self.muCR + self.c * np.mean(CR)
+        self.muF = (1 - self.c) * self.muF + self.c * np.sum(F ** 2) / np.sum(F)
+
+    def _cauchy(self, loc:np.ndarray) -> np.ndarray:
+        """Cauchy(loc, 0.1) truncated to 1, non-positive values are redrawn
+        """
+        F = np.empty_like(loc)
+        pending = np.arange(len(loc))
+        while len(pending) != 0:
+            drawn = loc[pending] + 0.1 * self.rng.standard_cauchy(len(pending))
+            accept = drawn > 0.0
+            F[pending[accept]] = np.minimum(drawn[accept], 1.0)
+            pending = pending[~accept]
+        return F
+
+    def _generationVectorized(self) -> None:
+        F, CR, p = self._sampleParameters()
+        rows = np.arange(self.popSize)
+        # pbest is drawn among the round(p * popSize) fittest individuals
+        order = np.argsort(self.fval if self.minimize else -self.fval, kind="stable")
+        top = np.maximum(1, np.round(p * self.popSize)).astype(np.intp)
+        pBest = order[(self.rng.random(self.popSize) * top).astype(np.intp)]
+        # r1 from the population, r2 from the population and the archive
+        r1 = self._distinctFrom(self.popSize, [rows])
+        r2 = self._distinctFrom(self.popSize + self.archiveSize, [rows, r1])
+        pool = np.concatenate((self.x, self.archive[:self.archiveSize]))
+        # mutation current-to-pbest/1
+        F = F[:, None]
+        mutant = self.x + F * (self.x[pBest] - self.x) + F * (self.x[r1] - pool[r2])
+        # crossover, at least one dimension comes from the mutant
+        cross = self.rng.random((self.popSize, self.dim)) <= CR[:, None]
+        cross[rows, self.rng.integers(0, self.dim, size=self.popSize)] = True
+        trial = np.where(cross, mutant, self.x)
+        # tail, halfway between the parent and the violated bound
+        lb = np.broadcast_to(self.lb, trial.shape)
+        ub = np.broadcast_to(self.ub, trial.shape)
+        trial = np.where(trial < lb, (lb + self.x) / 2, trial)
+        trial = np.where(trial > ub, (ub + self.x) / 2, trial)
+        # selection
+        fvalT = self._evaluateBatch(trial)
+        self.numOfEvaluations += self.popSize
+        if self.minimize:
+            success = fvalT < self.fval
+        else:
+            success = fvalT > self.fval
+        self._archive(self.x[success])
+        self._adaptParameters(F[success, 0], CR[success], np.abs(fvalT[success] - self.fval[success]))
+        self.x[success] = trial[success]
+        self.fval[success] = fvalT[success]
+        if self.minimize:
+            self.gBestIdx = int(self.fval.argmin())
+        else:
+            self.gBestIdx = int(self.fval.argmax())
+
+    def _distinctFrom(self, high:int, excluded:list[np.ndarray]) -> np.ndarray:
+        """draw one index in [0, high) per individual, different from the
+        excluded indices of that individual
+        """
+        drawn = self.rng.integers(0, high, size=self.popSize)
+        clash = np.zeros(self.popSize, dtype=bool)
+        for e in excluded:
+            clash |= drawn == e
+        pending = np.flatnonzero(clash)
+        while len(pending) != 0:
+            drawn[pending] = self.rng.integers(0, high, size=len(pending))
+            clash = np.zeros(len(pending), dtype=bool)
+            for e in excluded:
+                clash |= drawn[pending] == e[pending]
+            pending = pending[clash]
+        return drawn
+
+    def _archive(self, parents:np.ndarray) -> None:
+        capacity = len(self.archive)
+        if capacity == 0 or len(parents) == 0:
+            return
+        if len(parents) > capacity:
+            parents = parents[self.rng.choice(len(parents), size=capacity, replace=False)]
+        free = min(capacity - self.archiveSize, len(parents))
+        self.archive[self.archiveSize:self.archiveSize + free] = parents[:free]
+        self.archiveSize += free
+        # evict random rows for the rest
+        rest = parents[free:]
+        if len(rest) != 0:
+            self.archive[self.rng.choice(capacity, size=len(rest), replace=False)] = rest
+
+class SHADE(JADE):
+    def __init__(
+            self,
+            objectFunction:Function,
+            populationSize:int,
+            memorySize:int = None,
+            archiveRate:float = 1.0,
+            maxGeneration:int = 1000,
+            targetVal:float = None,
+            evaluator:Evaluator = None,
+            rdSeed:float = 0xD5F1306
+        ) -> None:
+        """success-history based adaptation, F and CR are sampled around
+        a random entry of a circular memory of improvement-weighted means
+        """
+        super().__init__(
+            objectFunction,
+            populationSize,
+            archiveRate=archiveRate,
+            maxGeneration=maxGeneration,
+            targetVal=targetVal,
+            evaluator=evaluator,
+            rdSeed=rdSeed
+        )
+        # success history
+        self.memorySize = memorySize if memorySize is not None else self.popSize
+        self.memoryF = np.full(self.memorySize, 0.5)
+        self.memoryCR = np.full(self.memorySize, 0.5)
+        self.memoryIdx:int = 0
+
+    def _state(self) -> dict[str, np.ndarray]:
+        state = super()._state()
+        state.update(memoryF=self.memoryF, memoryCR=self.memoryCR, memoryIdx=np.array(self.memoryIdx))
+        return state
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        super()._setState(state)
+        self.memoryF = state["memoryF"]
+        self.memoryCR = state["memoryCR"]
+        self.memoryIdx = int(state["memoryIdx"])
+
+    def _sampleParameters(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        r = self.rng.integers(0, self.memorySize, size=self.popSize)
+        F = self._cauchy(self.memoryF[r])
+        CR = np.clip(self.rng.normal(self.memoryCR[r], 0.1), 0.0, 1.0)
+        p = self.rng.uniform(2 / self.popSize, 0.2, size=self.popSize)
+        return F, CR, p
+
+    def _adaptParameters(self, F:np.ndarray, CR:np.ndarray, improvement:np.ndarray) -> None:
+        """store the improvement-weighted means in the next memory entry
+        """
+        if len(F) == 0:
+            return
+        w = improvement / np.sum(improvement) if np.sum(improvement) > 0 else np.full(len(F), 1 / len(F))
+        self.memoryCR[self.memoryIdx] = np.sum(w * CR)
+        self.memoryF[self.memoryIdx] = np.sum(w * F ** 2) / np.sum(w * F)
+        self.memoryIdx = (self.memoryIdx + 1) % self.memorySize
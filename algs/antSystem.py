@@ -1,56 +1,65 @@
 """antSystem.py Ant System
 """
 from tools.debug import DEBUG
-from random import seed, random, randrange
+from random import Random
 from tests.tsp import DirectedWeightedGraph
+from algs.construction import nearestNeighbor
+from algs.localSearch import LocalSearch, localSearchFor
+from algs.solver import Solver, Termination
+import numpy as np
 
 class _GraphWithPheromone:
-    def __init__(self, dwg:DirectedWeightedGraph) -> None:
-        self.distance = dwg.distance
+    def __init__(self, dwg:DirectedWeightedGraph, beta:float, candidateListSize:int) -> None:
+        # every ant deposits on every edge, so the pheromone stays dense
+        if not isinstance(dwg.distance, np.ndarray):
+            raise ValueError("AntSystem needs a dense distance matrix, use AntColonySystem for lazy graphs")
+        self.distance:np.ndarray = dwg.distance
         self.numOfCities = dwg.numOfCities
-        self.pheromone:list[list[float]] = None
+        self.pheromone:np.ndarray = None
+        # heuristic information eta^beta, fixed during the run
+        with np.errstate(divide="ignore"):
+            self.heuristic:np.ndarray = (1 / self.distance) ** beta
+        np.fill_diagonal(self.heuristic, 0.0)
+        # choice information tau^alpha * eta^beta, refreshed with the pheromone
+        self.choiceInfo:np.ndarray = None
+        # nearest neighbors of each city, None to consider all cities
+        self.candidates:np.ndarray = None
+        if candidateListSize > 0:
+            self.candidates = dwg.nearestNeighbors(candidateListSize)
 
 class _Ant:
-    def __init__(self) -> None:
-        self.toBeVisted:set[int] = set()
-        self.tour:list[int] = []
+    __slots__ = ("visited", "stamp", "tour", "cursor", "tourLength")
+
+    def __init__(self, visited:np.ndarray, tour:np.ndarray) -> None:
+        # city c is visited in the current tour iff visited[c] == stamp
+        self.visited = visited
+        self.stamp:int = 1
+        # preallocated tour buffer, filled up to cursor
+        self.tour = tour
+        self.cursor:int = 0
         self.tourLength:float = 0.0
     
     def reset(self) -> None:
-        self.toBeVisted.clear()
-        self.tour.clear()
+        if self.stamp == np.iinfo(self.visited.dtype).max:
+            self.visited.fill(0)
+            self.stamp = 0
+        self.stamp += 1
+        self.cursor = 0
         self.tourLength:float = 0.0
 
-class AntSystem:
-    def run(self) -> None:
-        # initialization phase
-        self._nearestNeighborHeuristic()
-        self.tao0 = self.numberOfAnts / self.gBestLength
-        self.g.pheromone = [[self.tao0 for _ in range(self.g.numOfCities)] for _ in range(self.g.numOfCities)]
-
-        # main loop
-        for _ in range(self.maxGeneration):
-            # cities to be visited
-            for k in range(self.numberOfAnts):
-                for c in range(self.g.numOfCities):
-                    self.ants[k].toBeVisted.add(c)
-            # select a starting city for ant k
-            for k in range(self.numberOfAnts):
-                self.ants[k].tour.append(randrange(0, self.g.numOfCities))
-                self.ants[k].toBeVisted.discard(self.ants[k].tour[0])
-            # build tours
-            for k in range(self.numberOfAnts):
-                for _ in range(self.g.numOfCities - 1):
-                    self._randomProportionalRule(k)
-            # go back to initial point
-            for ant in self.ants:
-                ant.tour.append(ant.tour[0])
-                ant.tourLength += self.g.distance[ant.tour[-2]][ant.tour[-1]]
-            # global pheromone updating
-            self._globalPheromoneUpdateingRule()
-            # reset the state of ants
-            for ant in self.ants:
-                ant.reset()
+    def visit(self, city:int) -> None:
+        self.tour[self.cursor] = city
+        self.cursor += 1
+        self.visited[city] = self.stamp
+
+    def unvisited(self) -> np.ndarray:
+        return np.flatnonzero(self.visited != self.stamp)
+
+class AntSystem(Solver):
+    def run(self, termination:Termination = None) -> None:
+        # main loop, maxGeneration generations unless termination is given
+        for _ in self.iterate(termination):
+            pass
 
         if DEBUG.ON:
             print("---------- AS ----------")
@@ -65,95 +74,221 @@ class AntSystem:
             alpha:int = 1,
             beta:int = 2,
             rho:float = 0.5,
+            candidateListSize:int = 0,
+            localSearch:str = None,
+            vectorized:bool = False,
             rdSeed:float = 0xD5F1306
         ) -> None:
-        
-        # random seed
-        seed(rdSeed)
+        super().__init__()
+        # random seed, every solver owns its random streams
+        self.rd = Random(rdSeed)
+        self.rng = np.random.default_rng(self.rd.getrandbits(64))
         # termination condition
         self.maxGeneration = maxGeneration
         # problem defined
-        self.g = _GraphWithPheromone(graph)
+        self.graph = graph
+        self.g = _GraphWithPheromone(graph, beta, candidateListSize)
         # ants colony
         self.numberOfAnts = numberOfAnts
-        self.ants = [_Ant() for _ in range(self.numberOfAnts)]
+        self.tours = np.empty((self.numberOfAnts, self.g.numOfCities + 1), dtype=np.intp)
+        self.tourLengths = np.zeros(self.numberOfAnts)
+        self.visited = np.zeros((self.numberOfAnts, self.g.numOfCities), dtype=np.uint32)
+        self.ants = [_Ant(self.visited[k], self.tours[k]) for k in range(self.numberOfAnts)]
+        # build the tours of the whole colony at once
+        self.vectorized = vectorized
         # parameter
         self.alpha = alpha
         self.beta = beta
         self.rho = rho
         self.tao0 = 0.0
+        # None, "best" for the iteration best tour only or "all" tours
+        self.localSearch = localSearch
+        self.improvement:LocalSearch = None
+        if localSearch is not None:
+            self.improvement = localSearchFor(graph)
         # result
         self.gBestTour = []
         self.gBestLength = None
-    
+
+    def _best(self) -> tuple[float, list[int]]:
+        return self.gBestLength, self.gBestTour
+
+    def _state(self) -> dict[str, np.ndarray]:
+        # the ants are reset between generations and need no saving
+        return {
+            "pheromone": self.g.pheromone,
+            "choiceInfo": self.g.choiceInfo,
+            "tao0": np.array(self.tao0),
+            "gBestTour": np.array(self.gBestTour, dtype=np.intp),
+            "gBestLength": np.array(self.gBestLength, dtype=np.float64)
+        }
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        self.g.pheromone = state["pheromone"]
+        self.g.choiceInfo = state["choiceInfo"]
+        self.tao0 = float(state["tao0"])
+        self.gBestTour = state["gBestTour"].tolist()
+        self.gBestLength = state["gBestLength"][()]
+
+    def _initialization(self) -> None:
+        self._nearestNeighborHeuristic()
+        self.tao0 = self.numberOfAnts / self.gBestLength
+        self.g.pheromone = np.full((self.g.numOfCities, self.g.numOfCities), self.tao0)
+        self.g.choiceInfo = np.empty_like(self.g.pheromone)
+        self._computeChoiceInformation()
+
+    def _generation(self) -> None:
+        # build tours
+        if self.vectorized:
+            self._buildToursVectorized()
+        else:
+            self._buildTours()
+        if self.localSearch is not None:
+            self._improveTours()
+        self._updategBest()
+        # global pheromone updating
+        self._globalPheromoneUpdateingRule()
+        # reset the state of ants
+        for ant in self.ants:
+            ant.reset()
+
+    def _buildTours(self) -> None:
+        """build the tours ant by ant
+        """
+        # select a starting city for ant k
+        for k in range(self.numberOfAnts):
+            self.ants[k].visit(self.rd.randrange(0, self.g.numOfCities))
+        # build tours
+        for k in range(self.numberOfAnts):
+            for _ in range(self.g.numOfCities - 1):
+                self._randomProportionalRule(k)
+        # go back to initial point
+        for k, ant in enumerate(self.ants):
+            ant.visit(ant.tour[0])
+            ant.tourLength += self.g.distance[ant.tour[-2], ant.tour[-1]]
+            self.tourLengths[k] = ant.tourLength
+
+    def _buildToursVectorized(self) -> None:
+        """build the tours of the whole colony at once, all ants advance
+        one step at a time and sample their next cities in one batch
+        """
+        n = self.g.numOfCities
+        ants = np.arange(self.numberOfAnts)
+        visited = self.visited
+        stamp = np.array([ant.stamp for ant in self.ants], dtype=visited.dtype)
+        self.tourLengths.fill(0.0)
+        # select a starting city for each ant
+        curCity = self.rng.integers(0, n, size=self.numberOfAnts)
+        self.tours[:, 0] = curCity
+        visited[ants, curCity] = stamp
+        # build tours
+        for step in range(1, n):
+            if self.g.candidates is None:
+                candidates = None
+                weights = np.where(visited == stamp[:, None], 0.0, self.g.choiceInfo[curCity])
+            else:
+                candidates = self.g.candidates[curCity]
+                weights = self.g.choiceInfo[curCity[:, None], candidates]
+                weights[visited[ants[:, None], candidates] == stamp[:, None]] = 0.0
+            nextCity = self._batchRouletteWheel(weights)
+            if candidates is not None:
+                nextCity = np.take_along_axis(candidates, nextCity[:, None], axis=1)[:, 0]
+            # ants without any weighted choice move to the best unvisited city
+            stuck = np.flatnonzero(weights.sum(axis=1) <= 0.0)
+            if len(stuck) != 0:
+                best = np.where(visited[stuck] == stamp[stuck, None], -1.0, self.g.choiceInfo[curCity[stuck]])
+                nextCity[stuck] = best.argmax(axis=1)
+            self.tourLengths += self.g.distance[curCity, nextCity]
+            visited[ants, nextCity] = stamp
+            self.tours[:, step] = nextCity
+            curCity = nextCity
+        # go back to initial point
+        self.tours[:, n] = self.tours[:, 0]
+        self.tourLengths += self.g.distance[curCity, self.tours[:, 0]]
+        for k, ant in enumerate(self.ants):
+            ant.cursor = n + 1
+            ant.tourLength = self.tourLengths[k]
+
+    def _batchRouletteWheel(self, weights:np.ndarray) -> np.ndarray:
+        """draw one column index per row of weights with probability
+        proportional to the weights
+        """
+        cumulative = np.cumsum(weights, axis=1)
+        s = self.rng.random(len(weights)) * cumulative[:, -1]
+        idx = (cumulative <= s[:, None]).sum(axis=1)
+        # floating-point rounding may push s to the total weight
+        overflow = np.flatnonzero(idx >= weights.shape[1])
+        if len(overflow) != 0:
+            idx[overflow] = weights.shape[1] - 1 - (weights[overflow, ::-1] > 0.0).argmax(axis=1)
+        return idx
+
     def _randomProportionalRule(self, curAnt:int) -> None:
         ant = self.ants[curAnt]
-        curCity = ant.tour[-1]
-        temp = []
-        for nextCity in ant.toBeVisted:
-            temp.append([
-                nextCity,
-                ((self.g.pheromone[curCity][nextCity]) ** self.alpha) * ((1 / self.g.distance[curCity][nextCity]) ** self.beta)
-            ])
-        
-        total = 0.0
-        for i in range(len(temp)):
-            if temp[i][1] == 0:
-                print(f"0: {curCity} -> {temp[i][0]}")
-                exit()
-            total += temp[i][1]
-        p = [[temp[i][0], temp[i][1] / total] for i in range(len(temp))]
-        s = random()
-        pSum = 0.0
-        for i in range(len(p)):
-            pSum += p[i][1]
-            if pSum >= s:
-                ant.tour.append(p[i][0])
-                ant.tourLength += self.g.distance[curCity][ant.tour[-1]]
-                ant.toBeVisted.discard(ant.tour[-1])
-                break
+        curCity = ant.tour[ant.cursor - 1]
+        candidates = self._unvisitedCandidates(ant, curCity)
+        if len(candidates) == 0:
+            # every nearest neighbor is visited, move to the best unvisited city
+            candidates = ant.unvisited()
+            nextCity = candidates[self.g.choiceInfo[curCity][candidates].argmax()]
+        else:
+            cumulative = np.cumsum(self.g.choiceInfo[curCity][candidates])
+            idx = np.searchsorted(cumulative, self.rd.random() * cumulative[-1])
+            nextCity = candidates[min(idx, len(candidates) - 1)]
+        ant.visit(nextCity)
+        ant.tourLength += self.g.distance[curCity, nextCity]
     
+    def _unvisitedCandidates(self, ant:_Ant, curCity:int) -> np.ndarray:
+        """return the unvisited cities in the candidate list of curCity,
+        or every unvisited city when no candidate list is used
+        """
+        if self.g.candidates is None:
+            return ant.unvisited()
+        candidates = self.g.candidates[curCity]
+        return candidates[ant.visited[candidates] != ant.stamp]
+
+    def _improveTours(self) -> None:
+        if self.localSearch == "all":
+            ants = range(self.numberOfAnts)
+        elif self.localSearch == "best":
+            ants = [int(self.tourLengths.argmin())]
+        else:
+            raise ValueError(f"unknown local search scope: {self.localSearch}")
+        for k in ants:
+            tour = self.tours[k, :-1].tolist()
+            self.tourLengths[k] = self.improvement.improve(tour, self.tourLengths[k])
+            self.tours[k, :-1] = tour
+            self.tours[k, -1] = tour[0]
+            self.ants[k].tourLength = self.tourLengths[k]
+
+    def _updategBest(self) -> None:
+        curBest = int(self.tourLengths.argmin())
+        if self.tourLengths[curBest] < self.gBestLength:
+            self.gBestTour = self.tours[curBest].tolist()
+            self.gBestLength = float(self.tourLengths[curBest])
+
     def _globalPheromoneUpdateingRule(self) -> None:
         # evaporate
-        for i in range(self.g.numOfCities):
-            for j in range(self.g.numOfCities):
-                self.g.pheromone[i][j] = (1 - self.rho) * self.g.pheromone[i][j]
-                self.g.pheromone[i][j] = max(self.g.pheromone[i][j], self.tao0)
-        # release
-        for ant in self.ants:
-            for i in range(self.g.numOfCities):
-                src = ant.tour[i]
-                dst = ant.tour[i + 1]
-                self.g.pheromone[src][dst] += (1 / ant.tourLength)
+        self.g.pheromone *= (1 - self.rho)
+        np.maximum(self.g.pheromone, self.tao0, out=self.g.pheromone)
+        # release, the edges of all ants are scattered at once
+        src = self.tours[:, :-1]
+        dst = self.tours[:, 1:]
+        deposit = np.broadcast_to((1 / self.tourLengths)[:, None], src.shape)
+        np.add.at(self.g.pheromone, (src, dst), deposit)
+        self._computeChoiceInformation()
+
+    def _computeChoiceInformation(self) -> None:
+        """refresh tau^alpha * eta^beta over the whole matrix
+        """
+        np.power(self.g.pheromone, self.alpha, out=self.g.choiceInfo)
+        self.g.choiceInfo *= self.g.heuristic
 
     def _nearestNeighborHeuristic(self) -> None:
         """return the tour length produced by the nearest neighbor heuristic
         """
-        visited = []
-        unvisited = {c for c in range(self.g.numOfCities)}
-
-        visited.append(randrange(0, self.g.numOfCities))
-        unvisited.discard(visited[0])
-        tourLength = 0.0
-        while len(unvisited) != 0:
-            nextCity = None
-            minLength = None
-            for c in unvisited:
-                if nextCity == None:
-                    nextCity = c
-                    minLength = self.g.distance[visited[-1]][nextCity]
-                else:
-                    length = self.g.distance[visited[-1]][c]
-                    if length < minLength:
-                        nextCity = c
-                        minLength = length
-            visited.append(nextCity)
-            unvisited.discard(nextCity)
-            tourLength += minLength
-        tourLength += self.g.distance[visited[-1]][visited[0]]
-        visited.append(visited[0])
-
-        self.gBestTour = [c for c in visited]
+        tour, tourLength = nearestNeighbor(self.graph, self.rd.randrange(0, self.g.numOfCities))
+        self.gBestTour = tour.tolist()
+        self.gBestTour.append(self.gBestTour[0])
         self.gBestLength = tourLength
     
         if DEBUG.ON:
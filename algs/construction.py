@@ -0,0 +1,231 @@
+"""construction.py tour construction heuristics
+
+every heuristic returns an open tour as an array of cities, without the
+closing city, and its length
+"""
+from math import hypot, inf
+import numpy as np
+from tests.tsp import DirectedWeightedGraph
+
+def tourLength(graph:DirectedWeightedGraph, tour:np.ndarray) -> float:
+    """return the length of the open tour closed back to its first city
+    """
+    return float(graph.distance[tour, np.roll(tour, -1)].sum())
+
+class _Grid:
+    def __init__(self, points:np.ndarray) -> None:
+        """uniform grid over the points, about two per cell, from which
+        visited cities are removed
+        """
+        n = len(points)
+        self.xs = points[:, 0]
+        self.ys = points[:, 1]
+        self.x = self.xs.tolist()
+        self.y = self.ys.tolist()
+        low = points.min(axis=0)
+        span = float((points.max(axis=0) - low).max())
+        self.size = max(1, int(np.sqrt(n / 2)))
+        self.cellSize = span / self.size if span > 0 else 1.0
+        cell = np.minimum(((points - low) / self.cellSize).astype(np.intp), self.size - 1)
+        self.cx = cell[:, 0].tolist()
+        self.cy = cell[:, 1].tolist()
+        self.cells = [[] for _ in range(self.size * self.size)]
+        # slot of every city in its cell and in the list of remaining cities
+        self.slot = [0] * n
+        for c in range(n):
+            members = self.cells[self.cx[c] * self.size + self.cy[c]]
+            self.slot[c] = len(members)
+            members.append(c)
+        self.remaining = list(range(n))
+        self.index = list(range(n))
+
+    @staticmethod
+    def _discard(members:list[int], slot:list[int], c:int) -> None:
+        last = members.pop()
+        if last != c:
+            members[slot[c]] = last
+            slot[last] = slot[c]
+
+    def remove(self, c:int) -> None:
+        self._discard(self.cells[self.cx[c] * self.size + self.cy[c]], self.slot, c)
+        self._discard(self.remaining, self.index, c)
+
+    def nearest(self, c:int) -> int:
+        """return the closest remaining city to c, the lowest index on ties
+        """
+        x, y = self.x[c], self.y[c]
+        cx, cy = self.cx[c], self.cy[c]
+        size = self.size
+        best, bestDistance = -1, inf
+        scanned = 0
+        for r in range(size):
+            for i in range(max(0, cx - r), min(size - 1, cx + r) + 1):
+                if i == cx - r or i == cx + r:
+                    cols = range(max(0, cy - r), min(size - 1, cy + r) + 1)
+                else:
+                    cols = [j for j in (cy - r, cy + r) if 0 <= j < size]
+                for j in cols:
+                    for p in self.cells[i * size + j]:
+                        d = hypot(x - self.x[p], y - self.y[p])
+                        if d < bestDistance or (d == bestDistance and p < best):
+                            best, bestDistance = p, d
+                scanned += len(cols)
+            # cities beyond ring r are at least r cells away
+            if best >= 0 and bestDistance < r * self.cellSize:
+                return best
+            if scanned > 4 * len(self.remaining):
+                # mostly empty cells left, scan the remaining cities instead
+                remaining = np.array(self.remaining)
+                d = np.hypot(self.xs[remaining] - x, self.ys[remaining] - y)
+                return int(remaining[d == d.min()].min())
+        return best
+
+def nearestNeighbor(graph:DirectedWeightedGraph, start:int) -> tuple[np.ndarray, float]:
+    """always move to the closest unvisited city, by row scans of a dense
+    matrix or through a grid index over the points of a lazy graph
+    """
+    n = graph.numOfCities
+    tour = np.empty(n, dtype=np.intp)
+    tour[0] = start
+    if not isinstance(graph.distance, np.ndarray):
+        grid = _Grid(graph.points)
+        grid.remove(start)
+        for step in range(1, n):
+            tour[step] = grid.nearest(int(tour[step - 1]))
+            grid.remove(int(tour[step]))
+    else:
+        # visited cities are pushed out of reach by an infinite penalty
+        penalty = np.zeros(n)
+        penalty[start] = inf
+        row = np.empty(n)
+        for step in range(1, n):
+            np.add(graph.distance[tour[step - 1]], penalty, out=row)
+            tour[step] = row.argmin()
+            penalty[tour[step]] = inf
+    return tour, tourLength(graph, tour)
+
+def randomizedNearestNeighbor(
+        graph:DirectedWeightedGraph,
+        start:int,
+        rng:np.random.Generator,
+        size:int = 3
+    ) -> tuple[np.ndarray, float]:
+    """move to one of the size closest unvisited cities chosen uniformly
+    """
+    n = graph.numOfCities
+    tour = np.empty(n, dtype=np.intp)
+    tour[0] = start
+    # unvisited cities in the first m entries
+    unvisited = np.arange(n)
+    unvisited[start], unvisited[n - 1] = n - 1, start
+    for step in range(1, n):
+        m = n - step
+        distance = graph.distance[tour[step - 1], unvisited[:m]]
+        k = min(size, m)
+        closest = np.argpartition(distance, k - 1)[:k] if k < m else np.arange(m)
+        i = closest[rng.integers(0, len(closest))]
+        tour[step] = unvisited[i]
+        unvisited[i], unvisited[m - 1] = unvisited[m - 1], unvisited[i]
+    return tour, tourLength(graph, tour)
+
+def greedyEdge(graph:DirectedWeightedGraph, candidateListSize:int = 10) -> tuple[np.ndarray, float]:
+    """add the candidate edges shortest first as long as no city gets a
+    third edge (or a second successor or predecessor on asymmetric
+    instances) and no cycle closes, then chain the fragments nearest first
+    """
+    n = graph.numOfCities
+    directed = not graph.isSymmetric()
+    neighbors = graph.nearestNeighbors(candidateListSize)
+    src = np.repeat(np.arange(n), neighbors.shape[1])
+    dst = neighbors.ravel().astype(np.intp)
+    order = np.argsort(graph.distance[src, dst], kind="stable")
+    # union-find over fragments
+    parent = list(range(n))
+    def find(c:int) -> int:
+        while parent[c] != c:
+            parent[c] = parent[parent[c]]
+            c = parent[c]
+        return c
+    succ = [-1] * n
+    pred = [-1] * n
+    adjacent = [[] for _ in range(n)]
+    for i, j in zip(src[order].tolist(), dst[order].tolist()):
+        if directed:
+            if succ[i] != -1 or pred[j] != -1:
+                continue
+        elif len(adjacent[i]) == 2 or len(adjacent[j]) == 2:
+            continue
+        ri, rj = find(i), find(j)
+        if ri == rj:
+            continue
+        parent[ri] = rj
+        succ[i], pred[j] = j, i
+        adjacent[i].append(j)
+        adjacent[j].append(i)
+    # walk the fragments from one of their ends
+    fragments = []
+    seen = [False] * n
+    for c in range(n):
+        if seen[c] or (pred[c] != -1 if directed else len(adjacent[c]) == 2):
+            continue
+        fragment = [c]
+        seen[c] = True
+        while True:
+            last = fragment[-1]
+            following = [succ[last]] if directed else adjacent[last]
+            following = [x for x in following if x != -1 and not seen[x]]
+            if len(following) == 0:
+                break
+            seen[following[0]] = True
+            fragment.append(following[0])
+        fragments.append(fragment)
+    # chain the fragments, each next one attached by its closest end
+    tour = fragments.pop(0)
+    while len(fragments) != 0:
+        heads = np.array([f[0] for f in fragments])
+        tails = np.array([f[-1] for f in fragments])
+        toHead = np.asarray(graph.distance[tour[-1], heads], dtype=np.float64)
+        k = int(toHead.argmin())
+        reverse = False
+        if not directed:
+            toTail = np.asarray(graph.distance[tour[-1], tails], dtype=np.float64)
+            if toTail.min() < toHead[k]:
+                k = int(toTail.argmin())
+                reverse = True
+        fragment = fragments.pop(k)
+        tour.extend(reversed(fragment) if reverse else fragment)
+    tour = np.array(tour, dtype=np.intp)
+    return tour, tourLength(graph, tour)
+
+def _hilbertIndex(points:np.ndarray, order:int = 16) -> np.ndarray:
+    """position of every point along a Hilbert curve over a 2^order grid
+    """
+    side = 1 << order
+    low = points.min(axis=0)
+    span = float((points.max(axis=0) - low).max())
+    scaled = (points - low) / (span if span > 0 else 1.0) * (side - 1)
+    x = scaled[:, 0].astype(np.int64)
+    y = scaled[:, 1].astype(np.int64)
+    d = np.zeros(len(points), dtype=np.int64)
+    s = side >> 1
+    while s > 0:
+        rx = (x & s) > 0
+        ry = (y & s) > 0
+        d += s * s * ((3 * rx) ^ ry)
+        # rotate the quadrant
+        flip = ~ry & rx
+        x = np.where(flip, side - 1 - x, x)
+        y = np.where(flip, side - 1 - y, y)
+        swap = ~ry
+        x, y = np.where(swap, y, x), np.where(swap, x, y)
+        s >>= 1
+    return d
+
+def spaceFillingCurve(graph:DirectedWeightedGraph) -> tuple[np.ndarray, float]:
+    """visit the cities in the order of a Hilbert curve through their
+    coordinates, O(n log n)
+    """
+    if graph.points is None:
+        raise ValueError("the space filling curve needs planar coordinates")
+    tour = np.argsort(_hilbertIndex(graph.points), kind="stable")
+    return tour, tourLength(graph, tour)
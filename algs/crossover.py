@@ -0,0 +1,112 @@
+"""crossover.py permutation crossover operators for the TSP
+
+every operator takes a batch of pairs of population rows, (first[i], second[i]),
+and overwrites both parents with their children in place
+"""
+import numpy as np
+
+def _cutPoints(n:int, size:int, rng:np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """return size pairs of inclusive cut points cut1 <= cut2
+    """
+    cut = np.sort(rng.integers(0, n, size=(size, 2)), axis=1)
+    return cut[:, 0], cut[:, 1]
+
+def _pmxChild(child:list[int], donor:list[int], cut1:int, cut2:int) -> list[int]:
+    """copy donor[cut1:cut2 + 1] into child, the displaced genes are repaired
+    through the inverse positions of child in O(n)
+    """
+    position = [0] * len(child)
+    for i, c in enumerate(child):
+        position[c] = i
+    for k in range(cut1, cut2 + 1):
+        incoming = donor[k]
+        outgoing = child[k]
+        j = position[incoming]
+        child[k], child[j] = incoming, outgoing
+        position[incoming], position[outgoing] = k, j
+    return child
+
+def pmx(population:np.ndarray, first:np.ndarray, second:np.ndarray, rng:np.random.Generator) -> None:
+    """partially mapped crossover
+    """
+    cut1, cut2 = _cutPoints(population.shape[1], len(first), rng)
+    parents1 = population[first].tolist()
+    parents2 = population[second].tolist()
+    for b in range(len(first)):
+        # _pmxChild rewrites the child, both donors must stay unmodified
+        population[first[b]] = _pmxChild(list(parents1[b]), parents2[b], cut1[b], cut2[b])
+        population[second[b]] = _pmxChild(list(parents2[b]), parents1[b], cut1[b], cut2[b])
+
+def _oxChildren(keep:np.ndarray, order:np.ndarray, cut1:np.ndarray, cut2:np.ndarray) -> np.ndarray:
+    """children keeping keep[b, cut1:cut2 + 1] in place, the other positions
+    are filled with the remaining genes in the order of order[b] starting after cut2
+    """
+    size, n = keep.shape
+    rows = np.arange(size)[:, None]
+    rolled = (cut2[:, None] + 1 + np.arange(n)) % n
+    # position of every gene in keep, to test whether it lies in the segment
+    position = np.empty_like(keep)
+    position[rows, keep] = np.arange(n)
+    candidates = order[rows, rolled]
+    candidatePosition = position[rows, candidates]
+    inSegment = (candidatePosition >= cut1[:, None]) & (candidatePosition <= cut2[:, None])
+    # the first n - len(segment) rolled positions are exactly the free ones
+    free = np.arange(n) < (n - (cut2 - cut1 + 1))[:, None]
+    children = keep.copy()
+    children[np.broadcast_to(rows, (size, n))[free], rolled[free]] = candidates[~inSegment]
+    return children
+
+def ox(population:np.ndarray, first:np.ndarray, second:np.ndarray, rng:np.random.Generator) -> None:
+    """order crossover, vectorized over all pairs
+    """
+    cut1, cut2 = _cutPoints(population.shape[1], len(first), rng)
+    parents1 = population[first]
+    parents2 = population[second]
+    population[first] = _oxChildren(parents1, parents2, cut1, cut2)
+    population[second] = _oxChildren(parents2, parents1, cut1, cut2)
+
+def _erxChild(parent1:list[int], parent2:list[int], directed:bool, rng:np.random.Generator) -> list[int]:
+    """edge recombination starting from the first gene of parent1
+    """
+    n = len(parent1)
+    # edge map, successors only for asymmetric instances, and the
+    # cities whose edge sets hold a given city
+    edges = [set() for _ in range(n)]
+    holders = [set() for _ in range(n)]
+    for parent in (parent1, parent2):
+        for i in range(n):
+            src, dst = parent[i - 1], parent[i]
+            edges[src].add(dst)
+            holders[dst].add(src)
+            if not directed:
+                edges[dst].add(src)
+                holders[src].add(dst)
+    # unvisited cities with their positions for O(1) random removal
+    unvisited = [c for c in range(n)]
+    position = [c for c in range(n)]
+    child = []
+    city = parent1[0]
+    while True:
+        child.append(city)
+        last = unvisited.pop()
+        if last != city:
+            unvisited[position[city]] = last
+            position[last] = position[city]
+        if len(child) == n:
+            return child
+        for c in holders[city]:
+            edges[c].discard(city)
+        if len(edges[city]) != 0:
+            # the neighbor with the fewest remaining edges
+            city = min(edges[city], key=lambda c: (len(edges[c]), c))
+        else:
+            city = unvisited[int(rng.integers(0, len(unvisited)))]
+
+def erx(population:np.ndarray, first:np.ndarray, second:np.ndarray, rng:np.random.Generator, directed:bool = False) -> None:
+    """edge recombination crossover, use directed = True for the ATSP
+    """
+    parents1 = population[first].tolist()
+    parents2 = population[second].tolist()
+    for b in range(len(first)):
+        population[first[b]] = _erxChild(parents1[b], parents2[b], directed, rng)
+        population[second[b]] = _erxChild(parents2[b], parents1[b], directed, rng)
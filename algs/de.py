@@ -1,46 +1,32 @@
 """de.py Differential Evolution
 """
 from tools.debug import DEBUG
-from random import seed, randrange, sample, uniform as rand
+from random import Random
+from concurrent.futures import Future, FIRST_COMPLETED, as_completed, wait
 from tests.functions import Function
+from tools.evaluator import Evaluator
+from algs.solver import MaxGeneration, Solver, TargetValue, Termination
+import numpy as np
 
-class DifferentialEvolution:
-    def run(self):
+class DifferentialEvolution(Solver):
+    def run(self, termination:Termination = None) -> None:
         DEBUG.PRINT("------- Differential Evolution --------")
-        # main loop
-        for _ in range(self.maxGeneration):
-            # process each solution
-            for i in range(self.popSize):
-                # mutation
-                trial = [0.0 for _ in range(self.dim)]
-                j = randrange(0, self.dim)
-                a, b, c = sample([x for x in range(self.popSize) if x != i], k = 3)
-                # crossover
-                for d in range(self.dim):
-                    if rand(0, 1) <= self.CR:
-                        trial[d] = self.x[a][d] + self.F * (self.x[b][d] - self.x[c][d])
-                    else:
-                        trial[d] = self.x[i][d]
-                trial[j] = self.x[a][j] + self.F * (self.x[b][d] - self.x[c][d])
-                # tail
-                for d in range(self.dim):
-                    if trial[d] < self.lb[d] or trial[d] > self.ub[d]:
-                        trial[d] = rand(self.lb[d], self.ub[d])
-                # selection
-                fvalT = self.f(trial)
-                if self.fitter(fvalT, self.fval[i]):
-                    # replace
-                    self.x[i] = [k for k in trial]
-                    self.fval[i] = fvalT
-                    if self.fitter(self.fval[i], self.fval[self.gBestIdx]):
-                        self.gBestIdx = i
+        # main loop, maxGeneration generations or until targetVal is reached
+        # unless termination is given
+        for _ in self.iterate(termination):
+            pass
+        # collect the trials still in flight
+        for future in as_completed(list(self._inFlight)):
+            i, trial = self._inFlight.pop(future)
+            self._selection(i, trial, future.result())
         # get the result
-        self.gBest = [i for i in self.x[self.gBestIdx]]
+        self.gBest = [float(i) for i in self.x[self.gBestIdx]]
         self.gBestVal = self.fval[self.gBestIdx]
         
         if DEBUG.ON:
             print(f"Best Val: {self.gBestVal}")
             print(f"Solution: {self.gBest}")
+            print(f"Evaluations: {self.numOfEvaluations}")
         
         DEBUG.PRINT("--------------- Finish ----------------")
 
@@ -51,23 +37,38 @@ class DifferentialEvolution:
             F:float = 0.5,
             CR:float = 0.9,
             maxGeneration:int = 1000,
+            generational:bool = False,
+            targetVal:float = None,
+            evaluator:Evaluator = None,
             rdSeed:float = 0xD5F1306
         ) -> None:
-        
-        # random seed
-        seed(rdSeed)
+        super().__init__()
+        # random seed, every solver owns its random streams
+        self.rd = Random(rdSeed)
+        self.rng = np.random.default_rng(self.rd.getrandbits(64))
         # termination condition
         self.maxGeneration = maxGeneration
+        self.targetVal = targetVal
+        # number of objective function evaluations so far
+        self.numOfEvaluations:int = 0
         # target function
         self.f = objectFunction.evaluate
+        self.fBatch = objectFunction.evaluateBatch
+        # trials are evaluated through the evaluator, steady-state unless generational
+        self.evaluator = evaluator
+        self._inFlight:dict[Future, tuple[int, list[float]]] = {}
+        self._nextTarget:int = 0
         self.fitter = objectFunction.fitter
+        self.minimize = objectFunction.minimize
         self.dim = objectFunction.D
         self.lb = objectFunction.lb
         self.ub = objectFunction.ub
         # population
         self.popSize = populationSize
-        self.x = [[rand(self.lb[i], self.ub[i]) for i in range(self.dim)] for _ in range(self.popSize)]
-        self.fval = [self.f(self.x[i]) for i in range(self.popSize)]
+        self.generational = generational
+        # sampled and evaluated in _initialization
+        self.x = None
+        self.fval = None
         # parameter
         self.F = F
         self.CR = CR
@@ -76,6 +77,166 @@ class DifferentialEvolution:
         self.gBest:list[float] = []
         self.gBestVal:float = 0.0
 
+    def _initialization(self) -> None:
+        if self.generational:
+            # the whole population as a (popSize, dim) array
+            self.x = self.rng.uniform(self.lb, self.ub, size=(self.popSize, self.dim))
+            self.fval = self._evaluateBatch(self.x)
+        else:
+            self.x = [[self.rd.uniform(self.lb[i], self.ub[i]) for i in range(self.dim)] for _ in range(self.popSize)]
+            if self.evaluator is not None:
+                self.fval = self.evaluator.map(self.f, self.x).tolist()
+            else:
+                self.fval = [self.f(self.x[i]) for i in range(self.popSize)]
+        self.numOfEvaluations += self.popSize
+        # the fittest individual so far
+        for i in range(self.popSize):
+            if self.fitter(self.fval[i], self.fval[self.gBestIdx]):
+                self.gBestIdx = i
+
+    def _termination(self) -> Termination:
+        if self.targetVal is None:
+            return MaxGeneration(self.maxGeneration)
+        return MaxGeneration(self.maxGeneration) | TargetValue(self.targetVal)
+
+    def _best(self) -> tuple[float, list[float]]:
+        return self.fval[self.gBestIdx], [float(i) for i in self.x[self.gBestIdx]]
+
+    def _state(self) -> dict[str, np.ndarray]:
+        # trials in flight are collected first, steady-state runs depend on
+        # the order evaluations complete in and are not reproducible anyway
+        for future in as_completed(list(self._inFlight)):
+            i, trial = self._inFlight.pop(future)
+            self._selection(i, trial, future.result())
+        return {
+            "x": np.asarray(self.x, dtype=np.float64),
+            "fval": np.asarray(self.fval, dtype=np.float64),
+            "gBestIdx": np.array(self.gBestIdx),
+            "numOfEvaluations": np.array(self.numOfEvaluations),
+            "nextTarget": np.array(self._nextTarget)
+        }
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        if self.generational:
+            self.x, self.fval = state["x"], state["fval"]
+        else:
+            self.x, self.fval = state["x"].tolist(), state["fval"].tolist()
+        self.gBestIdx = int(state["gBestIdx"])
+        self.numOfEvaluations = int(state["numOfEvaluations"])
+        self._nextTarget = int(state["nextTarget"])
+
+    def _generation(self) -> None:
+        if self.generational:
+            self._generationVectorized()
+        elif self.evaluator is not None:
+            self._generationSteadyState()
+        else:
+            self._generationAsynchronous()
+
+    def _generationAsynchronous(self) -> None:
+        """asynchronous generation, a better trial replaces its target at once
+        """
         for i in range(self.popSize):
+            trial = self._trial(i)
+            self._selection(i, trial, self.f(trial))
+
+    def _generationSteadyState(self) -> None:
+        """asynchronous generation with up to evaluator.workers trials in
+        flight, a trial replaces its target as soon as its result arrives;
+        a generation submits popSize trials, those still in flight at its
+        end are collected by the next one
+        """
+        submitted = 0
+        while submitted < self.popSize:
+            # keep every worker busy, one trial per target at most
+            while len(self._inFlight) < min(self.evaluator.workers, self.popSize) and submitted < self.popSize:
+                busy = {i for i, _ in self._inFlight.values()}
+                while self._nextTarget in busy:
+                    self._nextTarget = (self._nextTarget + 1) % self.popSize
+                trial = self._trial(self._nextTarget)
+                self._inFlight[self.evaluator.submit(self.f, trial)] = (self._nextTarget, trial)
+                self._nextTarget = (self._nextTarget + 1) % self.popSize
+                submitted += 1
+            done, _ = wait(self._inFlight, return_when=FIRST_COMPLETED)
+            for future in done:
+                i, trial = self._inFlight.pop(future)
+                self._selection(i, trial, future.result())
+
+    def _trial(self, i:int) -> list[float]:
+        """build a rand/1/bin trial vector for target i
+        """
+        # mutation
+        trial = [0.0 for _ in range(self.dim)]
+        j = self.rd.randrange(0, self.dim)
+        # three distinct donors other than i
+        a, b, c = [x if x < i else x + 1 for x in self.rd.sample(range(self.popSize - 1), k = 3)]
+        # crossover
+        for d in range(self.dim):
+            if self.rd.uniform(0, 1) <= self.CR:
+                trial[d] = self.x[a][d] + self.F * (self.x[b][d] - self.x[c][d])
+            else:
+                trial[d] = self.x[i][d]
+        trial[j] = self.x[a][j] + self.F * (self.x[b][j] - self.x[c][j])
+        # tail
+        for d in range(self.dim):
+            if trial[d] < self.lb[d] or trial[d] > self.ub[d]:
+                trial[d] = self.rd.uniform(self.lb[d], self.ub[d])
+        return trial
+
+    def _selection(self, i:int, trial:list[float], fvalT:float) -> None:
+        self.numOfEvaluations += 1
+        if self.fitter(fvalT, self.fval[i]):
+            # replace
+            self.x[i] = [k for k in trial]
+            self.fval[i] = fvalT
             if self.fitter(self.fval[i], self.fval[self.gBestIdx]):
                 self.gBestIdx = i
+
+    def _generationVectorized(self) -> None:
+        """generational rand/1/bin, all trials are built and scored at once
+        """
+        a, b, c = self._donorIndices().T
+        # mutation
+        mutant = self.x[a] + self.F * (self.x[b] - self.x[c])
+        # crossover, at least one dimension comes from the mutant
+        cross = self.rng.random((self.popSize, self.dim)) <= self.CR
+        cross[np.arange(self.popSize), self.rng.integers(0, self.dim, size=self.popSize)] = True
+        trial = np.where(cross, mutant, self.x)
+        # tail
+        outside = (trial < self.lb) | (trial > self.ub)
+        if outside.any():
+            trial[outside] = self.rng.uniform(
+                np.broadcast_to(self.lb, trial.shape)[outside],
+                np.broadcast_to(self.ub, trial.shape)[outside]
+            )
+        # selection
+        fvalT = self._evaluateBatch(trial)
+        self.numOfEvaluations += self.popSize
+        if self.minimize:
+            replace = fvalT < self.fval
+        else:
+            replace = fvalT > self.fval
+        self.x[replace] = trial[replace]
+        self.fval[replace] = fvalT[replace]
+        if self.minimize:
+            self.gBestIdx = int(self.fval.argmin())
+        else:
+            self.gBestIdx = int(self.fval.argmax())
+
+    def _evaluateBatch(self, x:np.ndarray) -> np.ndarray:
+        if self.evaluator is None:
+            return self.fBatch(x)
+        return self.evaluator.map(self.f, x)
+
+    def _donorIndices(self) -> np.ndarray:
+        """return three distinct donor indices other than i for each row i
+        """
+        donors = np.empty((self.popSize, 3), dtype=np.intp)
+        pending = np.arange(self.popSize)
+        while len(pending) != 0:
+            drawn = self.rng.integers(0, self.popSize - 1, size=(len(pending), 3))
+            drawn += drawn >= pending[:, None]
+            distinct = (drawn[:, 0] != drawn[:, 1]) & (drawn[:, 0] != drawn[:, 2]) & (drawn[:, 1] != drawn[:, 2])
+            donors[pending[distinct]] = drawn[distinct]
+            pending = pending[~distinct]
+        return donors
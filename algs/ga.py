@@ -1,29 +1,20 @@
 """ga.py Genetic Algorithm for TSP
 """
 from tools.debug import DEBUG
-from random import seed, randrange,shuffle,uniform as rand
+from random import Random
 from tests.tsp import DirectedWeightedGraph
-from copy import deepcopy
+from algs.construction import nearestNeighbor
+from algs.localSearch import LocalSearch, localSearchFor
+from algs.solver import Solver, Termination
+from algs.crossover import erx, ox, pmx
+from algs.selection import AliasTable, rouletteWheel, rouletteWheelBatch, stochasticUniversalSampling, tournament
+import numpy as np
 
-class _Chromosome:
-    def __init__(self) -> None:
-        self.gene:list[float|int] = None
-        self.tourLength:float = 0.0
-        self.fitnessVal:float = 0.0
-
-class GeneticAlgorithm:
-    def run(self) -> None:
-        # initialization phase
-        self._initialPopulation()
-        self._evaluation()
-        self._updategBest()
-        # main loop
-        for _ in range(self.maxGeneration):
-            self._selection()
-            self._crossover()
-            self._mutation()
-            self._evaluation()
-            self._updategBest()
+class GeneticAlgorithm(Solver):
+    def run(self, termination:Termination = None) -> None:
+        # main loop, maxGeneration generations unless termination is given
+        for _ in self.iterate(termination):
+            pass
 
         if DEBUG.ON:
             print("---------- GA ----------")
@@ -37,136 +28,216 @@ class GeneticAlgorithm:
             populationSize:int = 30,
             pc:float = 0.9,
             pm:float = 0.1,
+            selection:str = "roulette",
+            crossover:str = "pmx",
+            tournamentSize:int = 2,
+            localSearch:str = None,
             rdSeed:float = 0xD5F1306
         ) -> None:
-        
-        # random seed
-        seed(rdSeed)
+        super().__init__()
+        # random seed, every solver owns its random streams
+        self.rd = Random(rdSeed)
+        self.rng = np.random.default_rng(self.rd.getrandbits(64))
         # termination condition
         self.maxGeneration = maxGeneration
         # problem defined
         self.g = graph
-        # population size
+        # population, one chromosome per row with parallel length and fitness vectors
         self.popSize = populationSize
-        self.population = [_Chromosome() for _ in range(self.popSize)]
+        self.population = np.empty((self.popSize, self.g.numOfCities), dtype=np.int32)
+        self.tourLengths = np.zeros(self.popSize)
+        self.fitnessVal = np.zeros(self.popSize)
+        # whether a chromosome changed since its tour length was computed
+        self.dirty = np.ones(self.popSize, dtype=bool)
+        # buffers the next generation is gathered into
+        self._offspring = np.empty_like(self.population)
+        self._offspringLengths = np.empty_like(self.tourLengths)
+        self._offspringFitness = np.empty_like(self.fitnessVal)
+        self._offspringDirty = np.empty_like(self.dirty)
         # parameter
         self.pc = pc
         self.pm = pm
+        # one of "roulette", "alias", "sus" and "tournament"
+        self.selection = selection
+        self.tournamentSize = tournamentSize
+        # one of "pmx", "ox" and "erx"
+        self.crossover = crossover
+        # None, "best" for the iteration best tour only or "all" tours
+        self.localSearch = localSearch
+        self.improvement:LocalSearch = None
+        if localSearch is not None:
+            self.improvement = localSearchFor(graph)
+        # ERX only follows successor edges on asymmetric instances
+        self.symmetric = True
+        if crossover == "erx":
+            self.symmetric = self.g.isSymmetric()
         # result
         self.gBestTour = []
         self.gBestLength = float('inf')
-    
+
+    def _best(self) -> tuple[float, list[int]]:
+        return self.gBestLength, self.gBestTour
+
+    def _state(self) -> dict[str, np.ndarray]:
+        # the offspring buffers are overwritten before they are read
+        return {
+            "population": self.population,
+            "tourLengths": self.tourLengths,
+            "fitnessVal": self.fitnessVal,
+            "dirty": self.dirty,
+            "gBestTour": np.array(self.gBestTour, dtype=np.intp),
+            "gBestLength": np.array(self.gBestLength, dtype=np.float64)
+        }
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        self.population = state["population"]
+        self.tourLengths = state["tourLengths"]
+        self.fitnessVal = state["fitnessVal"]
+        self.dirty = state["dirty"]
+        self.gBestTour = state["gBestTour"].tolist()
+        self.gBestLength = state["gBestLength"][()]
+
+    def _initialization(self) -> None:
+        self._initialPopulation()
+        self._evaluation()
+        self._updategBest()
+
+    def _generation(self) -> None:
+        self._selection()
+        self._crossover()
+        self._mutation()
+        children = np.flatnonzero(self.dirty)
+        self._evaluation()
+        if self.localSearch is not None:
+            self._improveChromosomes(children)
+        self._updategBest()
+
+    def _improveChromosomes(self, children:np.ndarray) -> None:
+        """apply local search to the chromosomes changed in this generation
+        or only to the generation best
+        """
+        if self.localSearch == "best":
+            children = [int(self.tourLengths.argmin())]
+        elif self.localSearch != "all":
+            raise ValueError(f"unknown local search scope: {self.localSearch}")
+        for k in children:
+            tour = self.population[k].tolist()
+            self.tourLengths[k] = self.improvement.improve(tour, self.tourLengths[k])
+            self.fitnessVal[k] = 1 / self.tourLengths[k]
+            self.population[k] = tour
+
+    def immigrate(self, tour:list[int], tourLength:float) -> None:
+        """replace the worst chromosome with a closed tour from another population
+        """
+        worst = int(self.tourLengths.argmax())
+        self.population[worst] = tour[:-1]
+        self.tourLengths[worst] = tourLength
+        self.fitnessVal[worst] = 1 / tourLength
+        self.dirty[worst] = False
+        self._updategBest()
+
     def _initialPopulation(self) -> None:
         greedyInitial = round(self.popSize * 0.1)
         for i in range(greedyInitial):
-            chromosome = self.population[i]
-            chromosome.gene = [c for c in self._nearestNeighborHeuristic()]
+            self.population[i] = nearestNeighbor(self.g, self.rd.randrange(0, self.g.numOfCities))[0]
         for i in range(greedyInitial, self.popSize):
-            chromosome = self.population[i]
-            chromosome.gene = [c for c in range(self.g.numOfCities)]
-            shuffle(chromosome.gene)
+            gene = [c for c in range(self.g.numOfCities)]
+            self.rd.shuffle(gene)
+            self.population[i] = gene
     
     def _evaluation(self) -> None:
-        for chromosome in self.population:
-            chromosome.tourLength = 0.0
-            for i in range(-1, self.g.numOfCities - 1, 1):
-                src = chromosome.gene[i]
-                dst = chromosome.gene[i + 1]
-                chromosome.tourLength += self.g.distance[src][dst]
-            chromosome.fitnessVal = 1 / chromosome.tourLength
+        # only the chromosomes changed since the last evaluation
+        changed = np.flatnonzero(self.dirty)
+        if len(changed) != 0:
+            genes = self.population[changed]
+            self.tourLengths[changed] = self.g.distance[genes, np.roll(genes, -1, axis=1)].sum(axis=1)
+            self.fitnessVal[changed] = 1 / self.tourLengths[changed]
+            self.dirty[changed] = False
 
     def _selection(self) -> None:
-        # caculate cumulative probability
-        cumulativeProbability:list[float] = []
-        sumOfFitness:float = 0.0
-        for chromosome in self.population:
-            sumOfFitness += chromosome.fitnessVal
-        probability:float = 0.0
-        for chromosome in self.population:
-            probability += chromosome.fitnessVal / sumOfFitness
-            cumulativeProbability.append(probability)
-        # generate new population
-        newPopulation:list[_Chromosome] = []
-        for _ in range(self.popSize):
-            selected = self.rouletteWheel(cumulativeProbability)
-            newPopulation.append(deepcopy(self.population[selected]))
-        self.population = newPopulation
+        # draw all parents in one batch
+        if self.selection == "roulette":
+            selected = rouletteWheelBatch(self.fitnessVal, self.popSize, self.rng)
+        elif self.selection == "alias":
+            selected = AliasTable(self.fitnessVal).sample(self.popSize, self.rng)
+        elif self.selection == "sus":
+            selected = stochasticUniversalSampling(self.fitnessVal, self.popSize, self.rng)
+        elif self.selection == "tournament":
+            selected = tournament(self.fitnessVal, self.popSize, self.rng, self.tournamentSize)
+        else:
+            raise ValueError(f"unknown selection operator: {self.selection}")
+        # generate new population by gathering the selected rows
+        np.take(self.population, selected, axis=0, out=self._offspring)
+        np.take(self.tourLengths, selected, out=self._offspringLengths)
+        np.take(self.fitnessVal, selected, out=self._offspringFitness)
+        np.take(self.dirty, selected, out=self._offspringDirty)
+        # swap the double buffers
+        self.population, self._offspring = self._offspring, self.population
+        self.tourLengths, self._offspringLengths = self._offspringLengths, self.tourLengths
+        self.fitnessVal, self._offspringFitness = self._offspringFitness, self.fitnessVal
+        self.dirty, self._offspringDirty = self._offspringDirty, self.dirty
 
     def rouletteWheel(self, cumulativeProbability:list[float]) -> int:
-        r = rand(0,1)
-        for i in range(self.popSize):
-            if r < cumulativeProbability[i]:
-                return i
+        return rouletteWheel(cumulativeProbability, self.rd.uniform(0,1))
 
     def _crossover(self) -> None:
-        # using partially mapped crossover operator
-        first:int = -1
-        for i in range(self.popSize):
-            if rand(0,1) < self.pc:
-                if first != -1:
-                    # cross over
-                    p1Gene = self.population[first].gene
-                    p2Gene = self.population[i].gene
-                    c1Gene = [0.0 for _ in range(self.g.numOfCities)]
-                    c2Gene = [0.0 for _ in range(self.g.numOfCities)]
-
-                    crossPoint1 = randrange(0, self.g.numOfCities)
-                    crossPoint2 = randrange(0, self.g.numOfCities)
-                    if crossPoint1 > crossPoint2:
-                        crossPoint1, crossPoint2 = crossPoint2, crossPoint1
-                    # mapping
-                    p1top2 = {}
-                    p2top1 = {}
-                    # cross
-                    for k in range(crossPoint1, crossPoint2 + 1):
-                        c1Gene[k] = p2Gene[k]
-                        c2Gene[k] = p1Gene[k]
-                        p1top2[p2Gene[k]] = p1Gene[k]
-                        p2top1[p1Gene[k]] = p2Gene[k]
-                    # repair
-                    curIdx = (crossPoint2 + 1) % self.g.numOfCities
-                    for _ in range(self.g.numOfCities - (crossPoint2 + 1 - crossPoint1)):
-                        target1 = p1Gene[curIdx]
-                        target2 = p2Gene[curIdx]
-                        if target1 in p1top2:
-                            target1 = p1top2[target1]
-                            while target1 in p1top2:
-                                target1 = p1top2[target1]
-                        if target2 in p2top1:
-                            target2 = p2top1[target2]
-                            while target2 in p2top1:
-                                target2 = p2top1[target2]
-                        c1Gene[curIdx] = target1
-                        c2Gene[curIdx] = target2
-                        curIdx = (curIdx + 1) % self.g.numOfCities
-                    # finish
-                    self.population[first].gene = c1Gene
-                    self.population[i].gene = c2Gene
-                    first = -1
-                else:
-                    first = i
+        # pair up the chromosomes chosen for crossover in order
+        chosen = np.flatnonzero(self.rng.random(self.popSize) < self.pc)
+        pairs = chosen[:len(chosen) // 2 * 2].reshape(-1, 2)
+        if len(pairs) == 0:
+            return
+        first = pairs[:, 0]
+        second = pairs[:, 1]
+        # children overwrite their parents in the population matrix
+        if self.crossover == "pmx":
+            pmx(self.population, first, second, self.rng)
+        elif self.crossover == "ox":
+            ox(self.population, first, second, self.rng)
+        elif self.crossover == "erx":
+            erx(self.population, first, second, self.rng, directed=not self.symmetric)
+        else:
+            raise ValueError(f"unknown crossover operator: {self.crossover}")
+        self.dirty[first] = True
+        self.dirty[second] = True
 
     def _mutation(self) -> None:
         # simply swap two genes
-        for chromosome in self.population:
-            if rand(0,1) < self.pm:
+        for k in range(self.popSize):
+            if self.rd.uniform(0,1) < self.pm:
                 # mutation
-                r1 = randrange(0, self.g.numOfCities)
-                r2 = randrange(0, self.g.numOfCities)
+                gene = self.population[k]
+                r1 = self.rd.randrange(0, self.g.numOfCities)
+                r2 = self.rd.randrange(0, self.g.numOfCities)
                 while r2 == r1:
-                    r2 = randrange(0, self.g.numOfCities)
-                chromosome.gene[r1], chromosome.gene[r2] = chromosome.gene[r2], chromosome.gene[r1]
+                    r2 = self.rd.randrange(0, self.g.numOfCities)
+                if self.dirty[k]:
+                    gene[r1], gene[r2] = gene[r2], gene[r1]
+                else:
+                    # a clean chromosome only pays for the edges around the swap
+                    self.tourLengths[k] += self._swapDelta(gene, r1, r2)
+                    self.fitnessVal[k] = 1 / self.tourLengths[k]
+
+    def _swapDelta(self, gene:np.ndarray, r1:int, r2:int) -> float:
+        """swap the genes at r1 and r2, return the change of the tour length
+        """
+        n = self.g.numOfCities
+        # edge p leaves gene[p], adjacent swaps share edges
+        edges = {(r1 - 1) % n, r1, (r2 - 1) % n, r2}
+        before = 0.0
+        for p in edges:
+            before += self.g.distance[gene[p], gene[(p + 1) % n]]
+        gene[r1], gene[r2] = gene[r2], gene[r1]
+        after = 0.0
+        for p in edges:
+            after += self.g.distance[gene[p], gene[(p + 1) % n]]
+        return after - before
 
     def _updategBest(self) -> None:
-        curBest = self.population[0]
-        for i in range(self.popSize):
-            chromosome = self.population[i]
-            if chromosome.tourLength < curBest.tourLength:
-                curBest = self.population[i]
-        if curBest.tourLength < self.gBestLength:
-            self.gBestTour = [c for c in curBest.gene]
+        curBest = int(self.tourLengths.argmin())
+        if self.tourLengths[curBest] < self.gBestLength:
+            self.gBestTour = self.population[curBest].tolist()
             self.gBestTour.append(self.gBestTour[0])
-            self.gBestLength = curBest.tourLength
+            self.gBestLength = self.tourLengths[curBest]
     
     def printResult(self) -> None:
         """print the best tour and its length
@@ -177,25 +248,3 @@ class GeneticAlgorithm:
             else:
                 print(self.gBestTour[i] + 1, end=" -> ")
         print(f"length: {self.gBestLength}")
-    
-    def _nearestNeighborHeuristic(self) -> list[int]:
-        visited = []
-        unvisited = {c for c in range(self.g.numOfCities)}
-        visited.append(randrange(0, self.g.numOfCities))
-        unvisited.discard(visited[0])
-        while len(unvisited) != 0:
-            nextCity = None
-            minLength = None
-            for c in unvisited:
-                if nextCity == None:
-                    nextCity = c
-                    minLength = self.g.distance[visited[-1]][nextCity]
-                else:
-                    length = self.g.distance[visited[-1]][c]
-                    if length < minLength:
-                        nextCity = c
-                        minLength = length
-            visited.append(nextCity)
-            unvisited.discard(nextCity)
-        return visited
-        
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""island.py island model, one GA population or ACS colony per process
+
+the islands run their own generational loops and, every migrationInterval
+generations, send their best tour to the inboxes of their neighbors and
+immigrate whatever has arrived in their own inbox; migration is asynchronous
+so a slow island never stalls the others
+"""
+from tools.debug import DEBUG
+from random import Random
+from multiprocessing import Process, Queue
+from queue import Empty
+from tests.tsp import DirectedWeightedGraph
+from tools.sharedMemory import SharedGraph
+from algs.ga import GeneticAlgorithm
+from algs.solver import Termination
+
+def _neighbors(island:int, numberOfIslands:int, topology:str) -> list[int]:
+    """return the islands a migrant of island is sent to, random topologies
+    pick a single neighbor at every migration instead
+    """
+    if topology == "ring":
+        return [(island + 1) % numberOfIslands]
+    if topology == "full":
+        return [i for i in range(numberOfIslands) if i != island]
+    if topology == "random":
+        return []
+    raise ValueError(f"unknown topology {topology}")
+
+def _island(
+        island:int,
+        solverClass:type,
+        graph:SharedGraph,
+        kwargs:dict,
+        seed:int,
+        maxGeneration:int,
+        migrationInterval:int,
+        topology:str,
+        inboxes:list[Queue],
+        results:Queue,
+        termination:Termination
+    ) -> None:
+    solver = solverClass(graph.attach(), maxGeneration=maxGeneration, rdSeed=seed, **kwargs)
+    inbox = inboxes[island]
+    neighbors = _neighbors(island, len(inboxes), topology)
+    # migrants still buffered when the run ends are dropped
+    for q in inboxes:
+        q.cancel_join_thread()
+    for snapshot in solver.iterate(termination):
+        if snapshot.generation % migrationInterval != 0 or len(inboxes) == 1:
+            continue
+        # emigrate
+        if topology == "random":
+            neighbors = [solver.rd.choice([i for i in range(len(inboxes)) if i != island])]
+        for i in neighbors:
+            inboxes[i].put((solver.gBestTour, float(solver.gBestLength)))
+        # immigrate
+        while True:
+            try:
+                tour, tourLength = inbox.get_nowait()
+            except Empty:
+                break
+            solver.immigrate(tour, tourLength)
+    results.put((island, solver.gBestTour, float(solver.gBestLength), solver.trace))
+
+class IslandModel:
+    def run(self, termination:Termination = None) -> None:
+        """every island runs until termination holds for it, maxGeneration
+        generations by default
+        """
+        inboxes = [Queue() for _ in range(self.numberOfIslands)]
+        results = Queue()
+        # the islands attach to one copy of the distance matrix
+        with SharedGraph(self.g) as graph:
+            islands = [
+                Process(
+                    target=_island,
+                    args=(i, self.solverClass, graph, self.kwargs, self.seeds[i], self.maxGeneration,
+                          self.migrationInterval, self.topology, inboxes, results, termination)
+                )
+                for i in range(self.numberOfIslands)
+            ]
+            for p in islands:
+                p.start()
+            # collect before joining, the results are buffered in the queue
+            self.traces = [None] * self.numberOfIslands
+            for _ in range(self.numberOfIslands):
+                island, tour, tourLength, trace = results.get()
+                self.traces[island] = trace
+                if self.gBestLength is None or tourLength < self.gBestLength:
+                    self.gBestTour = tour
+                    self.gBestLength = tourLength
+            for p in islands:
+                p.join()
+        # the archipelago's best value after every generation
+        self.trace = [
+            (max(t for t, _ in entries), min(v for _, v in entries))
+            for entries in zip(*self.traces)
+        ]
+
+        if DEBUG.ON:
+            print("-------- Island --------")
+            self.printResult()
+            print("------------------------")
+
+    def __init__(
+            self,
+            graph:DirectedWeightedGraph,
+            solverClass:type = GeneticAlgorithm,
+            numberOfIslands:int = 4,
+            migrationInterval:int = 50,
+            topology:str = "ring",
+            maxGeneration:int = 1000,
+            rdSeed:float = 0xD5F1306,
+            **kwargs
+        ) -> None:
+        """solverClass is GeneticAlgorithm or AntColonySystem, kwargs are
+        passed to every island's solver
+        """
+        # every island gets its own seed
+        rd = Random(rdSeed)
+        self.seeds = [rd.getrandbits(64) for _ in range(numberOfIslands)]
+        # termination condition
+        self.maxGeneration = maxGeneration
+        # problem defined
+        self.g = graph
+        # islands
+        self.solverClass = solverClass
+        self.kwargs = kwargs
+        self.numberOfIslands = numberOfIslands
+        # one of "ring", "full" and "random"
+        self.topology = topology
+        _neighbors(0, numberOfIslands, topology)
+        self.migrationInterval = migrationInterval
+        # result
+        self.gBestTour = []
+        self.gBestLength = None
+        self.traces:list[list[tuple[float, float]]] = []
+        self.trace:list[tuple[float, float]] = []
+
+    def printResult(self) -> None:
+        """print the best tour and its length
+        """
+        for i in range(len(self.gBestTour)):
+            if i == len(self.gBestTour) - 1:
+                print(self.gBestTour[0] + 1)
+            else:
+                print(self.gBestTour[i] + 1, end=" -> ")
+        print(f"length: {self.gBestLength}")
@@ -0,0 +1,290 @@
+"""localSearch.py tour improvement for the TSP and the ATSP
+
+2-opt and Or-opt for symmetric instances, Or-opt and the reversal-free
+3-opt move a for asymmetric ones, all over an array tour with a position
+array, fixed-radius neighbor lists and don't-look bits; a queue holds the
+cities whose bits are off and every improving move puts the endpoints of
+its edges back in it
+"""
+from collections import deque
+from math import hypot
+import numpy as np
+from tests.tsp import DirectedWeightedGraph
+
+# improvements below EPS are rounding noise
+EPS = 1e-9
+
+class LocalSearch:
+    def __init__(
+            self,
+            graph:DirectedWeightedGraph,
+            neighborListSize:int = 10,
+            maxSegmentLength:int = 3
+        ) -> None:
+        """improve closed tours with 2-opt and Or-opt moves, searching only
+        the neighborListSize nearest neighbors of each city and moving
+        segments of up to maxSegmentLength cities
+        """
+        self.n = graph.numOfCities
+        self.neighbors = graph.nearestNeighbors(neighborListSize).tolist()
+        self.maxSegmentLength = maxSegmentLength
+        if isinstance(graph.distance, np.ndarray):
+            self.dist = graph.distance.item
+        else:
+            # lazy graphs, scalar lookups straight from the coordinates
+            x = graph.points[:, 0].tolist()
+            y = graph.points[:, 1].tolist()
+            self.dist = lambda a, b: hypot(x[a] - x[b], y[a] - y[b])
+
+    def improve(self, tour:list[int], tourLength:float) -> float:
+        """improve the open tour (without the closing city) in place,
+        return its new length
+        """
+        n = self.n
+        if n < 5:
+            return tourLength
+        self.tour = tour
+        self.pos = [0] * n
+        for i, c in enumerate(tour):
+            self.pos[c] = i
+        queue = deque(tour)
+        queued = [True] * n
+        while len(queue) != 0:
+            a = queue.popleft()
+            queued[a] = False
+            touched = self._improveCity(a)
+            if touched is None:
+                # the don't-look bit of a stays on
+                continue
+            gain, cities = touched
+            tourLength -= gain
+            for c in cities:
+                if not queued[c]:
+                    queued[c] = True
+                    queue.append(c)
+        return tourLength
+
+    def _improveCity(self, a:int) -> tuple[float, list[int]]:
+        touched = self._twoOpt(a)
+        if touched is None:
+            touched = self._orOpt(a)
+        return touched
+
+    def _succ(self, c:int) -> int:
+        return self.tour[self.pos[c] + 1 - self.n]
+
+    def _pred(self, c:int) -> int:
+        return self.tour[self.pos[c] - 1]
+
+    def _reverse(self, i:int, j:int) -> None:
+        """reverse the cyclic stretch of positions i to j
+        """
+        tour, pos, n = self.tour, self.pos, self.n
+        for _ in range(((j - i) % n + 1) // 2):
+            a, b = tour[i], tour[j]
+            tour[i], tour[j] = b, a
+            pos[a], pos[b] = j, i
+            i = i + 1 if i + 1 < n else 0
+            j = j - 1 if j > 0 else n - 1
+
+    def _reversePath(self, a:int, b:int) -> None:
+        """reverse the path from a forward to b, or equivalently for a
+        symmetric tour the rest of the tour, whichever is shorter
+        """
+        i, j = self.pos[a], self.pos[b]
+        if 2 * ((j - i) % self.n + 1) > self.n:
+            i, j = (j + 1) % self.n, (i - 1) % self.n
+        self._reverse(i, j)
+
+    def _twoOpt(self, a:int) -> tuple[float, list[int]]:
+        """return the gain and touched cities of the first improving 2-opt
+        move removing an edge at a, None if there is none
+        """
+        d = self.dist
+        for forward in (True, False):
+            b = self._succ(a) if forward else self._pred(a)
+            dab = d(a, b)
+            for c in self.neighbors[a]:
+                dac = d(a, c)
+                # fixed radius, a new edge must be shorter than the removed one
+                if dac >= dab:
+                    break
+                e = self._succ(c) if forward else self._pred(c)
+                if c == b or e == a:
+                    continue
+                gain = dab + d(c, e) - dac - d(b, e)
+                if gain > EPS:
+                    if forward:
+                        self._reversePath(b, c)
+                    else:
+                        self._reversePath(c, b)
+                    return gain, [a, b, c, e]
+        return None
+
+    def _orOpt(self, a:int) -> tuple[float, list[int]]:
+        """return the gain and touched cities of the first improving move of
+        a segment starting at a between two neighbors, None if there is none
+        """
+        d = self.dist
+        n = self.n
+        s1 = a
+        s2 = a
+        for length in range(1, min(self.maxSegmentLength, n - 3) + 1):
+            if length > 1:
+                s2 = self._succ(s2)
+            p = self._pred(s1)
+            nx = self._succ(s2)
+            removeGain = d(p, s1) + d(s2, nx) - d(p, nx)
+            if removeGain <= EPS:
+                continue
+            for end, other in ((s1, s2), (s2, s1)):
+                for c in self.neighbors[end]:
+                    dc = d(end, c)
+                    if dc >= removeGain:
+                        break
+                    # c must lie outside the segment
+                    if (self.pos[c] - self.pos[s1]) % n < length:
+                        continue
+                    # end next to c, on either side of it
+                    for u, v in ((c, self._succ(c)), (self._pred(c), c)):
+                        if u == p or u == s2:
+                            continue
+                        gain = removeGain + d(u, v) - dc - d(other, v if u == c else u)
+                        if gain > EPS:
+                            # the segment is inserted reversed when s1 is not next to u
+                            self._moveSegment(s1, s2, u, v, reverse=(end == s1) != (u == c))
+                            return gain, [p, nx, u, v, s1, s2]
+        return None
+
+    def _moveSegment(self, s1:int, s2:int, u:int, v:int, reverse:bool) -> None:
+        """move the segment s1..s2 between the consecutive cities u and v,
+        as s2..s1 if reverse, by three reversals of cyclic position ranges
+        """
+        n = self.n
+        i, j = self.pos[s1], self.pos[s2]
+        length = (j - i) % n + 1
+        # the stretch between the segment and the insertion point, after or before it
+        after = (self.pos[u] - j) % n
+        before = (i - self.pos[v]) % n
+        if after <= before:
+            # p A B v -> p B A v
+            self._reverse(i, self.pos[u])
+            self._reverse(i, (i + after - 1) % n)
+            if not reverse:
+                self._reverse((i + after) % n, (i + after + length - 1) % n)
+        else:
+            # u B A nx -> u A B nx
+            start = self.pos[v]
+            self._reverse(start, j)
+            if not reverse:
+                self._reverse(start, (start + length - 1) % n)
+            self._reverse((start + length) % n, j)
+
+class AsymmetricLocalSearch(LocalSearch):
+    def __init__(
+            self,
+            graph:DirectedWeightedGraph,
+            neighborListSize:int = 10,
+            maxSegmentLength:int = 3
+        ) -> None:
+        """improve closed ATSP tours with moves that keep every segment in
+        its direction, so a move changes exactly the removed and added edges
+        """
+        super().__init__(graph, neighborListSize, maxSegmentLength)
+        # neighbors holds the nearest successors, predecessors holds the
+        # cities closest to reaching each city
+        self.predecessors = DirectedWeightedGraph.fromArray(graph.distance.T).nearestNeighbors(neighborListSize).tolist()
+
+    def _improveCity(self, a:int) -> tuple[float, list[int]]:
+        touched = self._orOpt(a)
+        if touched is None:
+            touched = self._threeOptA(a)
+        return touched
+
+    def _orOpt(self, a:int) -> tuple[float, list[int]]:
+        """return the gain and touched cities of the first improving move of
+        a segment starting at a between two cities, None if there is none
+        """
+        d = self.dist
+        n = self.n
+        s1 = a
+        s2 = a
+        for length in range(1, min(self.maxSegmentLength, n - 3) + 1):
+            if length > 1:
+                s2 = self._succ(s2)
+            p = self._pred(s1)
+            nx = self._succ(s2)
+            removeGain = d(p, s1) + d(s2, nx) - d(p, nx)
+            if removeGain <= EPS:
+                continue
+            # u -> s1 with u a close predecessor, or s2 -> v with v a close successor
+            for neighbors, first in ((self.predecessors[s1], True), (self.neighbors[s2], False)):
+                for c in neighbors:
+                    dc = d(c, s1) if first else d(s2, c)
+                    if dc >= removeGain:
+                        break
+                    if (self.pos[c] - self.pos[s1]) % n < length:
+                        continue
+                    u, v = (c, self._succ(c)) if first else (self._pred(c), c)
+                    if u == p or u == s2:
+                        continue
+                    gain = removeGain + d(u, v) - d(u, s1) - d(s2, v)
+                    if gain > EPS:
+                        self._moveSegment(s1, s2, u, v, reverse=False)
+                        return gain, [p, nx, u, v, s1, s2]
+        return None
+
+    def _threeOptA(self, a:int) -> tuple[float, list[int]]:
+        """return the gain and touched cities of the first improving
+        a -> b..c -> d..e -> f into a -> d..e -> b..c -> f move, None if
+        there is none
+        """
+        d = self.dist
+        n = self.n
+        pos = self.pos
+        b = self._succ(a)
+        dab = d(a, b)
+        for dd in self.neighbors[a]:
+            g1 = dab - d(a, dd)
+            if g1 <= EPS:
+                break
+            if dd == b:
+                continue
+            c = self._pred(dd)
+            # e lies in d..pred(a), and e -> b must keep the partial gain positive
+            offset = (pos[dd] - pos[b]) % n
+            g1 += d(c, dd)
+            for e in self.predecessors[b]:
+                g2 = g1 - d(e, b)
+                if g2 <= EPS:
+                    break
+                if e == a or (pos[e] - pos[b]) % n < offset:
+                    continue
+                f = self._succ(e)
+                gain = g2 + d(e, f) - d(c, f)
+                if gain > EPS:
+                    self._exchangeSegments(b, c, dd, e)
+                    return gain, [a, b, c, dd, e, f]
+        return None
+
+    def _exchangeSegments(self, b:int, c:int, d:int, e:int) -> None:
+        """turn the cyclic order b..c d..e f..a into d..e b..c f..a; the
+        same order follows from swapping any two adjacent parts of the three,
+        so the pair with the fewest cities is swapped
+        """
+        n = self.n
+        starts = [self.pos[b], self.pos[d], (self.pos[e] + 1) % n]
+        lengths = [(starts[(k + 1) % 3] - starts[k]) % n for k in range(3)]
+        k = min(range(3), key=lambda k: lengths[k] + lengths[(k + 1) % 3])
+        i, la, lb = starts[k], lengths[k], lengths[(k + 1) % 3]
+        # A B -> B A by reversing A B, then B and A on their own
+        self._reverse(i, (i + la + lb - 1) % n)
+        self._reverse(i, (i + lb - 1) % n)
+        self._reverse((i + lb) % n, (i + la + lb - 1) % n)
+
+def localSearchFor(graph:DirectedWeightedGraph, neighborListSize:int = 10) -> LocalSearch:
+    """return the local search suited to the symmetry of graph
+    """
+    if graph.isSymmetric():
+        return LocalSearch(graph, neighborListSize)
+    return AsymmetricLocalSearch(graph, neighborListSize)
@@ -1,8 +1,11 @@
 """pso.py Particle Swarm Optimization
 """
 from tools.debug import DEBUG
-from random import seed, uniform as rand
+from random import Random
 from tests.functions import Function
+from tools.evaluator import Evaluator
+from algs.solver import Solver, Termination
+import numpy as np
 
 class Particle:
     def __init__(self, dimensio:int) -> None:
@@ -16,35 +19,20 @@ class Particle:
         self.pBest = [i for i in self.x]
         self.fpBest = self.fx
 
-class ParticleSwarmOptimization:
-    def run(self) -> None:
+class ParticleSwarmOptimization(Solver):
+    def run(self, termination:Termination = None) -> None:
         DEBUG.PRINT("----- Particle Swarm Optimization -----")
-        # main loop
-        for _ in range(self.maxGeneration):
-            gBest = self.swarm[self.gBestIdx]
-            # update each particle
-            for i in range(self.popSize):
-                p = self.swarm[i]
-                for d in range(self.dim):
-                    # update velocity
-                    p.v[d] = self.w * p.v[d] + self.c1 * rand(0,1) * (p.pBest[d] - p.x[d]) \
-                                + self.c2 * rand(0,1) * (gBest.pBest[d] - p.x[d])
-                    p.v[d] = max(-self.vmax[d], min(p.v[d], self.vmax[d]))
-                    # update position
-                    p.x[d] = p.x[d] + p.v[d]
-                    p.x[d] = max(self.lb[d], min(p.x[d], self.ub[d]))
-                # evaluate
-                p.fx = self.f(p.x)
-                # update pBest
-                if self.fitter(p.fx, p.fpBest):
-                    p.updatepBest
-                    # update gBest
-                    if self.fitter(p.fpBest, gBest.fpBest):
-                        self.gBestIdx = i
+        # main loop, maxGeneration generations unless termination is given
+        for _ in self.iterate(termination):
+            pass
 
         # get the result
-        self.gBest = [i for i in self.swarm[self.gBestIdx].x]
-        self.gBestVal = self.swarm[self.gBestIdx].fpBest
+        if self.vectorized:
+            self.gBest = self.pBest[self.gBestIdx].tolist()
+            self.gBestVal = self.fpBest[self.gBestIdx]
+        else:
+            self.gBest = [i for i in self.swarm[self.gBestIdx].pBest]
+            self.gBestVal = self.swarm[self.gBestIdx].fpBest
 
         if DEBUG.ON:
             print(f"Best Val: {self.gBestVal}")
@@ -61,31 +49,31 @@ class ParticleSwarmOptimization:
             w:float = 0.9,
             vmaxPercent:float = 0.2,
             maxGeneration:int = 1000,
+            vectorized:bool = False,
+            evaluator:Evaluator = None,
             rdSeed:float = 0xD5F1306
         ) -> None:
-        
-        # random seed
-        seed(rdSeed)
+        super().__init__()
+        # random seed, every solver owns its random streams
+        self.rd = Random(rdSeed)
+        self.rng = np.random.default_rng(self.rd.getrandbits(64))
         # termination condition
         self.maxGeneration = maxGeneration
         # target funciton
         self.f = objectFunction.evaluate
+        self.fBatch = objectFunction.evaluateBatch
+        # the whole swarm is submitted to the evaluator at once
+        self.evaluator = evaluator
         self.fitter = objectFunction.fitter
+        self.minimize = objectFunction.minimize
         self.dim = objectFunction.D
         self.lb = objectFunction.lb
         self.ub = objectFunction.ub
         self.vmax = [vmaxPercent * (self.ub[x] - self.lb[x]) for x in range(self.dim)]
         # population
         self.popSize = populationSize
+        self.vectorized = vectorized or self.evaluator is not None
         self.swarm:list[Particle] = []
-        for _ in range(self.popSize):
-            newParticle = Particle(self.dim)
-            for d in range(self.dim):
-                newParticle.x[d] = rand(self.lb[d], self.ub[d])
-                newParticle.v[d] = rand(-self.vmax[d], self.vmax[d])
-            newParticle.fx = self.f(newParticle.x)
-            newParticle.updatepBest()
-            self.swarm.append(newParticle)
         # parameter
         self.c1 = c1
         self.c2 = c2
@@ -95,6 +83,125 @@ class ParticleSwarmOptimization:
         self.gBest:list[float] = []
         self.gBestVal:float = 0.0
 
+    def _initialization(self) -> None:
+        if self.vectorized:
+            # the whole swarm as (popSize, dim) arrays
+            self.x = self.rng.uniform(self.lb, self.ub, size=(self.popSize, self.dim))
+            self.v = self.rng.uniform(np.negative(self.vmax), self.vmax, size=(self.popSize, self.dim))
+            self.fx = self._evaluateSwarm(self.x)
+            self.pBest = self.x.copy()
+            self.fpBest = self.fx.copy()
+        else:
+            for _ in range(self.popSize):
+                newParticle = Particle(self.dim)
+                for d in range(self.dim):
+                    newParticle.x[d] = self.rd.uniform(self.lb[d], self.ub[d])
+                    newParticle.v[d] = self.rd.uniform(-self.vmax[d], self.vmax[d])
+                newParticle.fx = self.f(newParticle.x)
+                newParticle.updatepBest()
+                self.swarm.append(newParticle)
+        # the fittest particle so far
+        if self.vectorized:
+            self.gBestIdx = self._fittest(self.fpBest)
+        else:
+            for i in range(self.popSize):
+                if self.fitter(self.swarm[i].fpBest, self.swarm[self.gBestIdx].fpBest):
+                    self.gBestIdx = i
+
+    def _generation(self) -> None:
+        if self.vectorized:
+            self._updateSwarmVectorized()
+        else:
+            self._updateSwarm()
+
+    def _best(self) -> tuple[float, list[float]]:
+        if self.vectorized:
+            return self.fpBest[self.gBestIdx], self.pBest[self.gBestIdx].tolist()
+        return self.swarm[self.gBestIdx].fpBest, list(self.swarm[self.gBestIdx].pBest)
+
+    def _state(self) -> dict[str, np.ndarray]:
+        if self.vectorized:
+            state = {"x": self.x, "v": self.v, "fx": self.fx, "pBest": self.pBest, "fpBest": self.fpBest}
+        else:
+            state = {
+                "x": np.array([p.x for p in self.swarm]),
+                "v": np.array([p.v for p in self.swarm]),
+                "fx": np.array([p.fx for p in self.swarm]),
+                "pBest": np.array([p.pBest for p in self.swarm]),
+                "fpBest": np.array([p.fpBest for p in self.swarm])
+            }
+        state["gBestIdx"] = np.array(self.gBestIdx)
+        return state
+
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        if self.vectorized:
+            self.x, self.v, self.fx = state["x"], state["v"], state["fx"]
+            self.pBest, self.fpBest = state["pBest"], state["fpBest"]
+        else:
+            self.swarm = [Particle(self.dim) for _ in range(self.popSize)]
+            for i, p in enumerate(self.swarm):
+                p.x = state["x"][i].tolist()
+                p.v = state["v"][i].tolist()
+                p.fx = float(state["fx"][i])
+                p.pBest = state["pBest"][i].tolist()
+                p.fpBest = float(state["fpBest"][i])
+        self.gBestIdx = int(state["gBestIdx"])
+
+    def _updateSwarm(self) -> None:
+        """update the particles one by one
+        """
+        gBest = self.swarm[self.gBestIdx]
         for i in range(self.popSize):
-            if self.fitter(self.swarm[i].fpBest, self.swarm[self.gBestIdx].fpBest):
-                self.gBestIdx = i
\ No newline at end of file
+            p = self.swarm[i]
+            for d in range(self.dim):
+                # update velocity
+                p.v[d] = self.w * p.v[d] + self.c1 * self.rd.uniform(0,1) * (p.pBest[d] - p.x[d]) \
+                            + self.c2 * self.rd.uniform(0,1) * (gBest.pBest[d] - p.x[d])
+                p.v[d] = max(-self.vmax[d], min(p.v[d], self.vmax[d]))
+                # update position
+                p.x[d] = p.x[d] + p.v[d]
+                p.x[d] = max(self.lb[d], min(p.x[d], self.ub[d]))
+            # evaluate
+            p.fx = self.f(p.x)
+            # update pBest
+            if self.fitter(p.fx, p.fpBest):
+                p.updatepBest()
+                # update gBest
+                if self.fitter(p.fpBest, gBest.fpBest):
+                    self.gBestIdx = i
+                    gBest = p
+
+    def _updateSwarmVectorized(self) -> None:
+        """update the whole swarm with array operations
+        """
+        r1 = self.rng.random((self.popSize, self.dim))
+        r2 = self.rng.random((self.popSize, self.dim))
+        # update velocity
+        self.v *= self.w
+        self.v += self.c1 * r1 * (self.pBest - self.x)
+        self.v += self.c2 * r2 * (self.pBest[self.gBestIdx] - self.x)
+        np.clip(self.v, np.negative(self.vmax), self.vmax, out=self.v)
+        # update position
+        self.x += self.v
+        np.clip(self.x, self.lb, self.ub, out=self.x)
+        # evaluate
+        self.fx = self._evaluateSwarm(self.x)
+        # update pBest
+        if self.minimize:
+            improved = self.fx < self.fpBest
+        else:
+            improved = self.fx > self.fpBest
+        self.pBest[improved] = self.x[improved]
+        self.fpBest[improved] = self.fx[improved]
+        # update gBest
+        self.gBestIdx = self._fittest(self.fpBest)
+
+    def _evaluateSwarm(self, x:np.ndarray) -> np.ndarray:
+        if self.evaluator is None:
+            return self.fBatch(x)
+        return self.evaluator.map(self.f, x)
+
+    def _fittest(self, fval:np.ndarray) -> int:
+        if self.minimize:
+            return int(fval.argmin())
+        return int(fval.argmax())
@@ -0,0 +1,65 @@
+"""selection.py selection operators for population based algorithms
+
+every operator favours larger weights, pass fitness values (e.g. 1 / tour length)
+"""
+from bisect import bisect_right
+import numpy as np
+
+def rouletteWheel(cumulativeProbability:list[float], r:float) -> int:
+    """return the first index whose cumulative probability exceeds r in O(log n)
+    """
+    # rounding may leave the last cumulative probability below r
+    return min(bisect_right(cumulativeProbability, r), len(cumulativeProbability) - 1)
+
+def rouletteWheelBatch(weights:np.ndarray, size:int, rng:np.random.Generator) -> np.ndarray:
+    """draw size indices with probability proportional to weights
+    """
+    cumulative = np.cumsum(weights)
+    idx = np.searchsorted(cumulative, rng.random(size) * cumulative[-1], side="right")
+    return np.minimum(idx, len(weights) - 1)
+
+def stochasticUniversalSampling(weights:np.ndarray, size:int, rng:np.random.Generator) -> np.ndarray:
+    """draw size indices with evenly spaced pointers and a single random offset
+    """
+    cumulative = np.cumsum(weights)
+    spacing = cumulative[-1] / size
+    pointers = rng.random() * spacing + spacing * np.arange(size)
+    idx = np.searchsorted(cumulative, pointers, side="right")
+    return np.minimum(idx, len(weights) - 1)
+
+def tournament(weights:np.ndarray, size:int, rng:np.random.Generator, tournamentSize:int = 2) -> np.ndarray:
+    """draw size indices, each the fittest of tournamentSize uniformly chosen contestants
+    """
+    contestants = rng.integers(0, len(weights), size=(size, tournamentSize))
+    winner = weights[contestants].argmax(axis=1)
+    return contestants[np.arange(size), winner]
+
+class AliasTable:
+    def __init__(self, weights:np.ndarray) -> None:
+        """Walker's alias table built with Vose's method, O(n) to build and
+        O(1) per draw afterwards
+        """
+        n = len(weights)
+        scaled = np.asarray(weights, dtype=np.float64) * (n / np.sum(weights))
+        self.prob = np.ones(n)
+        self.alias = np.arange(n)
+        small = [i for i in range(n) if scaled[i] < 1.0]
+        large = [i for i in range(n) if scaled[i] >= 1.0]
+        while len(small) != 0 and len(large) != 0:
+            s = small.pop()
+            l = large[-1]
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] -= 1.0 - scaled[s]
+            if scaled[l] < 1.0:
+                small.append(large.pop())
+        # the leftovers are full columns up to rounding
+        for i in small + large:
+            self.prob[i] = 1.0
+
+    def sample(self, size:int, rng:np.random.Generator) -> np.ndarray:
+        """draw size indices from the table
+        """
+        column = rng.integers(0, len(self.prob), size=size)
+        accept = rng.random(size) < self.prob[column]
+        return np.where(accept, column, self.alias[column])
@@ -0,0 +1,232 @@
+"""solver.py common step-wise protocol of the solvers and termination criteria
+
+a solver is advanced one generation at a time with step(), or driven by
+iterate(termination), which yields a snapshot of the best-so-far after every
+generation until the termination criterion holds; run() iterates to the end
+
+the state of a solver between two generations, its random streams included,
+can be saved to an .npz checkpoint and loaded into a solver constructed with
+the same arguments, which then continues exactly as the original would have
+"""
+from abc import ABC, abstractmethod
+from os import fsync, getpid, replace
+from time import perf_counter
+from typing import Iterator
+import json
+import numpy as np
+
+class Snapshot:
+    __slots__ = ("generation", "elapsed", "best", "solution", "minimize")
+
+    def __init__(self, generation:int, elapsed:float, best:float, solution:list, minimize:bool) -> None:
+        self.generation = generation
+        # seconds since the solver started, initialization included
+        self.elapsed = elapsed
+        # best-so-far value and the tour or point achieving it
+        self.best = best
+        self.solution = solution
+        self.minimize = minimize
+
+class Termination(ABC):
+    def reset(self) -> None:
+        """forget the state of a previous run
+        """
+        pass
+
+    @abstractmethod
+    def done(self, snapshot:Snapshot) -> bool:
+        pass
+
+    def __or__(self, other:"Termination") -> "Termination":
+        return AnyOf(self, other)
+
+    def __and__(self, other:"Termination") -> "Termination":
+        return AllOf(self, other)
+
+class MaxGeneration(Termination):
+    def __init__(self, maxGeneration:int) -> None:
+        self.maxGeneration = maxGeneration
+
+    def done(self, snapshot:Snapshot) -> bool:
+        return snapshot.generation >= self.maxGeneration
+
+class TimeLimit(Termination):
+    def __init__(self, seconds:float) -> None:
+        self.seconds = seconds
+
+    def done(self, snapshot:Snapshot) -> bool:
+        return snapshot.elapsed >= self.seconds
+
+class TargetValue(Termination):
+    def __init__(self, target:float) -> None:
+        """stop once the best-so-far is at least as good as target
+        """
+        self.target = target
+
+    def done(self, snapshot:Snapshot) -> bool:
+        if snapshot.minimize:
+            return snapshot.best <= self.target
+        return snapshot.best >= self.target
+
+class Stagnation(Termination):
+    def __init__(self, generations:int) -> None:
+        """stop after generations consecutive generations without improvement
+        """
+        self.generations = generations
+        self.reset()
+
+    def reset(self) -> None:
+        self.best:float = None
+        self.since:int = 0
+
+    def done(self, snapshot:Snapshot) -> bool:
+        if self.best is None or (snapshot.best < self.best if snapshot.minimize else snapshot.best > self.best):
+            self.best = snapshot.best
+            self.since = snapshot.generation
+        return snapshot.generation - self.since >= self.generations
+
+class AnyOf(Termination):
+    def __init__(self, *criteria:Termination) -> None:
+        self.criteria = criteria
+
+    def reset(self) -> None:
+        for c in self.criteria:
+            c.reset()
+
+    def done(self, snapshot:Snapshot) -> bool:
+        # every criterion sees every snapshot, stateful ones keep counting
+        return sum(c.done(snapshot) for c in self.criteria) != 0
+
+class AllOf(AnyOf):
+    def done(self, snapshot:Snapshot) -> bool:
+        return sum(c.done(snapshot) for c in self.criteria) == len(self.criteria)
+
+class Solver(ABC):
+    # the problems of the function optimizers may be maximized
+    minimize:bool = True
+
+    def __init__(self) -> None:
+        self.generation:int = 0
+        self._start:float = None
+        # best value after every generation with the elapsed seconds
+        self.trace:list[tuple[float, float]] = []
+        # saveCheckpoint(checkpointFile) every checkpointInterval generations
+        self.checkpointFile:str = None
+        self.checkpointInterval:int = 100
+
+    def _initialization(self) -> None:
+        pass
+
+    @abstractmethod
+    def _generation(self) -> None:
+        pass
+
+    @abstractmethod
+    def _best(self) -> tuple[float, list]:
+        """return the best-so-far value and solution
+        """
+        pass
+
+    @abstractmethod
+    def _state(self) -> dict[str, np.ndarray]:
+        """return the arrays the next generations depend on, besides the
+        random streams
+        """
+        pass
+
+    @abstractmethod
+    def _setState(self, state:dict[str, np.ndarray]) -> None:
+        pass
+
+    def _termination(self) -> Termination:
+        """the criterion used when none is given
+        """
+        return MaxGeneration(self.maxGeneration)
+
+    def snapshot(self) -> Snapshot:
+        best, solution = self._best()
+        return Snapshot(self.generation, perf_counter() - self._start, float(best), solution, self.minimize)
+
+    def step(self) -> Snapshot:
+        """run one generation, initializing first if needed
+        """
+        if self._start is None:
+            self._start = perf_counter()
+            self._initialization()
+        self._generation()
+        self.generation += 1
+        snapshot = self.snapshot()
+        self.trace.append((snapshot.elapsed, snapshot.best))
+        if self.checkpointFile is not None and self.generation % self.checkpointInterval == 0:
+            self.saveCheckpoint(self.checkpointFile)
+        return snapshot
+
+    def iterate(self, termination:Termination = None) -> Iterator[Snapshot]:
+        """yield a snapshot after every generation until termination holds,
+        which is checked once before the first generation as well
+        """
+        if termination is None:
+            termination = self._termination()
+        termination.reset()
+        if self._start is None:
+            self._start = perf_counter()
+            self._initialization()
+        snapshot = self.snapshot()
+        while not termination.done(snapshot):
+            snapshot = self.step()
+            yield snapshot
+
+    def run(self, termination:Termination = None) -> None:
+        for _ in self.iterate(termination):
+            pass
+
+    def setCheckpoint(self, fileName:str, interval:int = 100) -> None:
+        """save a checkpoint to fileName every interval generations, None
+        turns checkpointing off
+        """
+        self.checkpointFile = fileName
+        self.checkpointInterval = interval
+
+    def saveCheckpoint(self, fileName:str) -> None:
+        """write the state to fileName as raw arrays, through a temporary
+        file swapped in once complete so a crash never leaves half of one
+        """
+        if self._start is None:
+            raise ValueError("the solver has not been initialized")
+        state = self._state()
+        version, internal, gauss = self.rd.getstate()
+        state["rd"] = np.array(internal, dtype=np.uint32)
+        state["trace"] = np.array(self.trace, dtype=np.float64).reshape(-1, 2)
+        meta = {
+            "solver": type(self).__name__,
+            "generation": self.generation,
+            "elapsed": perf_counter() - self._start,
+            "rdVersion": version,
+            "rdGauss": gauss,
+            "rng": self.rng.bit_generator.state if hasattr(self, "rng") else None
+        }
+        state["meta"] = np.array(json.dumps(meta))
+        tmp = f"{fileName}.{getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.savez(f, **state)
+            f.flush()
+            fsync(f.fileno())
+        replace(tmp, fileName)
+
+    def loadCheckpoint(self, fileName:str) -> None:
+        """restore the state saved by saveCheckpoint into this solver, which
+        must have been constructed with the same arguments
+        """
+        with np.load(fileName) as data:
+            state = {key: data[key] for key in data.files}
+        meta = json.loads(str(state.pop("meta")))
+        if meta["solver"] != type(self).__name__:
+            raise ValueError(f"checkpoint of {meta['solver']}, not of {type(self).__name__}")
+        self.rd.setstate((meta["rdVersion"], tuple(state.pop("rd").tolist()), meta["rdGauss"]))
+        if meta["rng"] is not None:
+            self.rng.bit_generator.state = meta["rng"]
+        self.trace = [(t, v) for t, v in state.pop("trace").tolist()]
+        self.generation = meta["generation"]
+        # the elapsed time carries on from the checkpoint, skipping initialization
+        self._start = perf_counter() - meta["elapsed"]
+        self._setState(state)
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from math import pi, cos, exp, sqrt
+import numpy as np
 
 class Function(ABC):
     def __init__(
@@ -25,16 +25,77 @@ class Function(ABC):
     def evaluate(self, solution:list[float]) -> float:
         pass
 
-# Rastrigin function
-class Ackley(Function):
-    def evaluate(self, solution: list[float]) -> float:
+    def evaluateBatch(self, solutions:np.ndarray) -> np.ndarray:
+        """return the values of the rows of an (N, D) array, falls back
+        to evaluate row by row unless overridden
+        """
+        return np.fromiter((self.evaluate(x) for x in solutions), dtype=np.float64, count=len(solutions))
+
+class BenchmarkFunction(Function):
+    def __init__(
+            self,
+            lb:list[float],
+            ub:list[float],
+            minimize:bool = True,
+            shift:list[float] = None,
+            rotation:list[list[float]] = None
+        ) -> None:
+        """vectorized benchmark evaluated at z = rotation (x - shift)
+        """
+        super().__init__(lb, ub, minimize)
+        self.shift:np.ndarray = None if shift is None else np.asarray(shift, dtype=np.float64)
+        self.rotation:np.ndarray = None if rotation is None else np.asarray(rotation, dtype=np.float64)
+
+    def evaluate(self, solution:list[float]) -> float:
+        return float(self.evaluateBatch(np.asarray(solution, dtype=np.float64)[None, :])[0])
+
+    def evaluateBatch(self, solutions:np.ndarray) -> np.ndarray:
+        z = np.asarray(solutions, dtype=np.float64)
+        if self.shift is not None:
+            z = z - self.shift
+        if self.rotation is not None:
+            z = z @ self.rotation.T
+        return self._evaluate(z)
+
+    @abstractmethod
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
+        """return the values of the rows of the transformed (N, D) array
+        """
+        pass
+
+# Ackley function
+class Ackley(BenchmarkFunction):
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
         a = 20
         b = 0.2
-        c = 2 * pi
+        c = 2 * np.pi
         d = self.D
-        alpha = 0.0
-        beta = 0.0
-        for x in solution:
-            alpha += (x ** 2)
-            beta += cos(c *x)
-        return - a * exp(-b * sqrt(alpha / d)) - exp(beta / d) + a + exp(1)
\ No newline at end of file
+        alpha = np.sum(z ** 2, axis=1)
+        beta = np.sum(np.cos(c * z), axis=1)
+        return - a * np.exp(-b * np.sqrt(alpha / d)) - np.exp(beta / d) + a + np.e
+
+# Sphere function
+class Sphere(BenchmarkFunction):
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
+        return np.sum(z ** 2, axis=1)
+
+# Rastrigin function
+class Rastrigin(BenchmarkFunction):
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
+        return 10 * self.D + np.sum(z ** 2 - 10 * np.cos(2 * np.pi * z), axis=1)
+
+# Rosenbrock function
+class Rosenbrock(BenchmarkFunction):
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
+        return np.sum(100 * (z[:, 1:] - z[:, :-1] ** 2) ** 2 + (z[:, :-1] - 1) ** 2, axis=1)
+
+# Griewank function
+class Griewank(BenchmarkFunction):
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
+        i = np.arange(1, self.D + 1)
+        return 1 + np.sum(z ** 2, axis=1) / 4000 - np.prod(np.cos(z / np.sqrt(i)), axis=1)
+
+# Schwefel 2.26 function
+class Schwefel(BenchmarkFunction):
+    def _evaluate(self, z:np.ndarray) -> np.ndarray:
+        return 418.9829 * self.D - np.sum(z * np.sin(np.sqrt(np.abs(z))), axis=1)
@@ -1,25 +1,138 @@
 """test.py data structure and data sets for tsp
 """
-from math import sqrt
+import numpy as np
+
 class DirectedWeightedGraph:
+    # number of matrix entries computed per block when building from points
+    BLOCK_SIZE = 1 << 22
+
     def __init__(
             self,
             data:list[list[float]],
-            points2matrix:bool = False
+            points2matrix:bool = False,
+            dtype:type = np.float64
         ) -> None:
         """input distance matrix or points matrix
+
+        the distances are kept in one contiguous numpy array, so that
+        `distance[src]` is a row view that can be indexed without copying
         """
         self.numOfCities = len(data)
-        self.distance:list[list[float]] = None
+        self.points:np.ndarray = None
+        self.distance:np.ndarray = None
         if points2matrix:
             # input points' coordinates
-            self.distance = [[0 for _ in range(self.numOfCities)] for _ in range(self.numOfCities)]
-            for src in range(self.numOfCities):
-                for dst in range(self.numOfCities):
-                    self.distance[src][dst] = sqrt((data[src][0] - data[dst][0]) ** 2 + (data[src][1] - data[dst][1]) ** 2)
+            self.points = np.asarray(data, dtype=np.float64)
+            self.distance = np.empty((self.numOfCities, self.numOfCities), dtype=dtype)
+            x = self.points[:, 0]
+            y = self.points[:, 1]
+            step = max(1, self.BLOCK_SIZE // max(1, self.numOfCities))
+            for src in range(0, self.numOfCities, step):
+                dst = min(src + step, self.numOfCities)
+                np.hypot(
+                    np.subtract.outer(x[src:dst], x),
+                    np.subtract.outer(y[src:dst], y),
+                    out=self.distance[src:dst],
+                    dtype=np.float64,
+                    casting="same_kind"
+                )
         else:
             # input distance matrix
-            self.distance = [[data[i][j] for j in range(self.numOfCities)] for i in range(self.numOfCities)]
+            self.distance = np.array(data, dtype=dtype)
+
+    @classmethod
+    def fromArray(cls, distance:np.ndarray, points:np.ndarray = None) -> "DirectedWeightedGraph":
+        """wrap an existing (n, n) distance array without copying it, e.g. a
+        view of shared memory or of a memory-mapped file
+        """
+        graph = cls.__new__(cls)
+        graph.numOfCities = len(distance)
+        graph.points = points
+        graph.distance = distance
+        return graph
+
+    def nearestNeighbors(self, k:int) -> np.ndarray:
+        """return the k nearest successors of every city, closest first
+        """
+        k = min(k, self.numOfCities - 1)
+        neighbors = np.empty((self.numOfCities, k), dtype=np.int32)
+        step = max(1, self.BLOCK_SIZE // max(1, self.numOfCities))
+        for src in range(0, self.numOfCities, step):
+            dst = min(src + step, self.numOfCities)
+            rows = self.distance[src:dst].astype(np.float64)
+            # a city is never its own neighbor
+            rows[np.arange(dst - src), np.arange(src, dst)] = np.inf
+            part = np.argpartition(rows, k - 1, axis=1)[:, :k]
+            order = np.take_along_axis(rows, part, axis=1).argsort(axis=1, kind="stable")
+            neighbors[src:dst] = np.take_along_axis(part, order, axis=1)
+        return neighbors
+
+    def isSymmetric(self) -> bool:
+        return np.array_equal(self.distance, self.distance.T)
+
+class _LazyDistance:
+    def __init__(self, points:np.ndarray) -> None:
+        """Euclidean distances computed on demand with the indexing of an
+        (n, n) array, nothing is cached
+        """
+        self.x = points[:, 0]
+        self.y = points[:, 1]
+        self.shape = (len(points), len(points))
+        self.dtype = np.dtype(np.float64)
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    @property
+    def T(self) -> "_LazyDistance":
+        return self
+
+    def __getitem__(self, key) -> np.ndarray:
+        if isinstance(key, tuple):
+            src, dst = key
+            if isinstance(src, slice):
+                return self[src][:, dst]
+            # scalars, broadcast index arrays or a row segment
+            return np.hypot(self.x[src] - self.x[dst], self.y[src] - self.y[dst])
+        if isinstance(key, slice):
+            return np.hypot(np.subtract.outer(self.x[key], self.x), np.subtract.outer(self.y[key], self.y))
+        src = int(key)
+        return np.hypot(self.x[src] - self.x, self.y[src] - self.y)
+
+class CoordinateGraph(DirectedWeightedGraph):
+    def __init__(
+            self,
+            data:list[list[float]],
+            neighborListSize:int = 16
+        ) -> None:
+        """Euclidean graph over points that never materializes the n^2
+        matrix, distance supports the same indexing as the dense matrix and
+        the neighborListSize nearest neighbors of every city are precomputed
+        """
+        self.numOfCities = len(data)
+        self.points = np.asarray(data, dtype=np.float64)
+        self.distance = _LazyDistance(self.points)
+        self.neighbors = super().nearestNeighbors(neighborListSize)
+
+    @classmethod
+    def fromNeighbors(cls, points:np.ndarray, neighbors:np.ndarray) -> "CoordinateGraph":
+        """wrap existing points and neighbor lists without copying them or
+        searching the neighbors again, e.g. views of shared memory
+        """
+        graph = cls.__new__(cls)
+        graph.numOfCities = len(points)
+        graph.points = points
+        graph.distance = _LazyDistance(points)
+        graph.neighbors = neighbors
+        return graph
+
+    def nearestNeighbors(self, k:int) -> np.ndarray:
+        if k <= self.neighbors.shape[1]:
+            return self.neighbors[:, :k].copy()
+        return super().nearestNeighbors(k)
+
+    def isSymmetric(self) -> bool:
+        return True
 
 inf = float('inf')
 
@@ -0,0 +1,211 @@
+"""tsplib.py streaming TSPLIB (.tsp / .atsp) loader with a binary cache
+
+the file is read line by line, coordinates and explicit weights go straight
+into preallocated arrays and the distance matrix is computed in row blocks;
+with caching enabled the matrix is written to <file>.distance.npy and later
+loads memory-map it instead of parsing the text again
+"""
+from os import path as osPath, getpid, remove, replace
+import numpy as np
+from tests.tsp import DirectedWeightedGraph
+
+# coordinate based edge weight types
+COORDINATE_TYPES = ("EUC_2D", "CEIL_2D", "ATT", "GEO")
+# explicit edge weight formats
+EXPLICIT_FORMATS = ("FULL_MATRIX", "UPPER_ROW", "LOWER_ROW", "UPPER_DIAG_ROW", "LOWER_DIAG_ROW")
+
+def _readHeader(f) -> tuple[dict[str, str], str]:
+    """return the specification entries and the first section keyword
+    """
+    spec = {}
+    for line in f:
+        line = line.strip()
+        if len(line) == 0:
+            continue
+        if ":" in line:
+            key, value = line.split(":", 1)
+            spec[key.strip().upper()] = value.strip()
+        else:
+            return spec, line.upper()
+    return spec, "EOF"
+
+class _Numbers:
+    def __init__(self, f) -> None:
+        """numbers of f however they are spread over lines, the rest of a
+        line is kept for the next read
+        """
+        self.f = f
+        self.tokens:list[str] = []
+        self.used = 0
+
+    def read(self, out:np.ndarray) -> None:
+        """fill the flat array out with the next len(out) numbers
+        """
+        count = len(out)
+        filled = 0
+        while filled < count:
+            if self.used == len(self.tokens):
+                line = self.f.readline()
+                if len(line) == 0:
+                    raise ValueError(f"expected {count} numbers, found {filled}")
+                self.tokens = line.split()
+                self.used = 0
+                continue
+            take = min(len(self.tokens) - self.used, count - filled)
+            out[filled:filled + take] = self.tokens[self.used:self.used + take]
+            self.used += take
+            filled += take
+
+def _readCoordinates(f, n:int) -> np.ndarray:
+    # node id and two coordinates per line, nodes may come in any order
+    rows = np.empty((n, 3))
+    _Numbers(f).read(rows.reshape(-1))
+    points = np.empty((n, 2))
+    points[rows[:, 0].astype(np.intp) - 1] = rows[:, 1:]
+    return points
+
+def _mirror(out:np.ndarray, upper:bool) -> None:
+    """copy the upper (or lower) triangle of out onto the other one, a block
+    of rows at a time
+    """
+    n = len(out)
+    step = max(1, DirectedWeightedGraph.BLOCK_SIZE // n)
+    for src in range(0, n, step):
+        dst = min(src + step, n)
+        if upper:
+            out[src:dst, :src] = out[:src, src:dst].T
+            rows, cols = np.tril_indices(dst - src, -1)
+        else:
+            out[src:dst, dst:] = out[dst:, src:dst].T
+            rows, cols = np.triu_indices(dst - src, 1)
+        block = out[src:dst, src:dst]
+        block[rows, cols] = block[cols, rows]
+
+def _readExplicit(f, n:int, edgeWeightFormat:str, out:np.ndarray) -> None:
+    """read explicit weights straight into out, a row at a time for the
+    triangular formats, which are then mirrored
+    """
+    numbers = _Numbers(f)
+    if edgeWeightFormat == "FULL_MATRIX":
+        numbers.read(out.reshape(-1))
+        return
+    upper = edgeWeightFormat.startswith("UPPER")
+    diagonal = edgeWeightFormat.endswith("DIAG_ROW")
+    if not diagonal:
+        out[np.arange(n), np.arange(n)] = 0
+    for i in range(n):
+        if upper:
+            numbers.read(out[i, i if diagonal else i + 1:])
+        else:
+            numbers.read(out[i, :i + 1 if diagonal else i])
+    _mirror(out, upper)
+
+def _geoRadians(points:np.ndarray) -> np.ndarray:
+    # DDD.MM degrees and minutes to radians, with TSPLIB's value of pi
+    degrees = np.trunc(points)
+    return 3.141592 * (degrees + 5.0 * (points - degrees) / 3.0) / 180.0
+
+def _coordinateBlock(edgeWeightType:str, points:np.ndarray, src:int, dst:int) -> np.ndarray:
+    """return the rows src:dst of the distance matrix as TSPLIB defines them
+    """
+    if edgeWeightType == "GEO":
+        radians = _geoRadians(points)
+        latitude, longitude = radians[:, 0], radians[:, 1]
+        q1 = np.cos(np.subtract.outer(longitude[src:dst], longitude))
+        q2 = np.cos(np.subtract.outer(latitude[src:dst], latitude))
+        q3 = np.cos(np.add.outer(latitude[src:dst], latitude))
+        cosine = np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1.0, 1.0)
+        block = np.trunc(6378.388 * np.arccos(cosine) + 1.0)
+    else:
+        dx = np.subtract.outer(points[src:dst, 0], points[:, 0])
+        dy = np.subtract.outer(points[src:dst, 1], points[:, 1])
+        if edgeWeightType == "ATT":
+            r = np.sqrt((dx * dx + dy * dy) / 10.0)
+            t = np.floor(r + 0.5)
+            block = np.where(t < r, t + 1.0, t)
+        elif edgeWeightType == "CEIL_2D":
+            block = np.ceil(np.hypot(dx, dy))
+        else:
+            block = np.floor(np.hypot(dx, dy) + 0.5)
+    # a city is at distance 0 from itself
+    block[np.arange(dst - src), np.arange(src, dst)] = 0.0
+    return block
+
+def _parse(fileName:str, allocate) -> tuple[np.ndarray, np.ndarray]:
+    """parse fileName into allocate((n, n)), return the distances and the
+    coordinates, None for explicit instances
+    """
+    with open(fileName) as f:
+        spec, section = _readHeader(f)
+        n = int(spec["DIMENSION"])
+        edgeWeightType = spec.get("EDGE_WEIGHT_TYPE", "").upper()
+        points = None
+        distance = None
+        while section != "EOF":
+            if section == "NODE_COORD_SECTION":
+                points = _readCoordinates(f, n)
+            elif section == "EDGE_WEIGHT_SECTION":
+                edgeWeightFormat = spec.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX").upper()
+                if edgeWeightFormat not in EXPLICIT_FORMATS:
+                    raise ValueError(f"unsupported EDGE_WEIGHT_FORMAT {edgeWeightFormat}")
+                distance = allocate((n, n))
+                _readExplicit(f, n, edgeWeightFormat, distance)
+            elif section == "DISPLAY_DATA_SECTION":
+                _readCoordinates(f, n)
+            elif section != "FIXED_EDGES_SECTION" and section != "TOUR_SECTION":
+                raise ValueError(f"unsupported section {section}")
+            else:
+                # lists terminated by -1
+                for line in f:
+                    if line.strip() == "-1":
+                        break
+            section = "EOF"
+            for line in f:
+                if len(line.strip()) != 0:
+                    section = line.strip().upper()
+                    break
+    if distance is None:
+        if edgeWeightType not in COORDINATE_TYPES:
+            raise ValueError(f"unsupported EDGE_WEIGHT_TYPE {edgeWeightType}")
+        if points is None:
+            raise ValueError("missing NODE_COORD_SECTION")
+        distance = allocate((n, n))
+        step = max(1, DirectedWeightedGraph.BLOCK_SIZE // n)
+        for src in range(0, n, step):
+            dst = min(src + step, n)
+            distance[src:dst] = _coordinateBlock(edgeWeightType, points, src, dst)
+    return distance, points
+
+def loadTSPLIB(fileName:str, cache:bool = True, dtype:type = np.float64) -> DirectedWeightedGraph:
+    """return the graph of a TSPLIB instance, with cache = True the matrix
+    is memory-mapped from <fileName>.distance.npy, which is rebuilt whenever
+    it is older than fileName
+    """
+    if not cache:
+        distance, points = _parse(fileName, lambda shape: np.empty(shape, dtype=dtype))
+        return DirectedWeightedGraph.fromArray(distance, points)
+    distanceFile = fileName + ".distance.npy"
+    pointsFile = fileName + ".points.npy"
+    fresh = osPath.exists(distanceFile) and osPath.getmtime(distanceFile) >= osPath.getmtime(fileName)
+    if fresh:
+        distance = np.load(distanceFile, mmap_mode="r")
+        fresh = distance.dtype == np.dtype(dtype)
+    if not fresh:
+        # parse straight into a memory-mapped temporary file, then swap it in
+        tmp = f"{distanceFile}.{getpid()}.tmp"
+        mapped = []
+        def allocate(shape:tuple) -> np.ndarray:
+            mapped.append(np.lib.format.open_memmap(tmp, mode="w+", dtype=dtype, shape=shape))
+            return mapped[-1]
+        distance, points = _parse(fileName, allocate)
+        distance.flush()
+        del distance, mapped
+        if points is not None:
+            np.save(f"{pointsFile}.{getpid()}.tmp.npy", points)
+            replace(f"{pointsFile}.{getpid()}.tmp.npy", pointsFile)
+        elif osPath.exists(pointsFile):
+            remove(pointsFile)
+        replace(tmp, distanceFile)
+        distance = np.load(distanceFile, mmap_mode="r")
+    points = np.load(pointsFile) if osPath.exists(pointsFile) and osPath.getmtime(pointsFile) >= osPath.getmtime(fileName) else None
+    return DirectedWeightedGraph.fromArray(distance, points)
@@ -0,0 +1,114 @@
+"""evaluator.py pluggable objective evaluation backends
+
+every evaluator hands out concurrent.futures.Future objects, so solvers can
+either map a whole population or keep trials in flight and react to
+results as they arrive
+"""
+from abc import ABC, abstractmethod
+from asyncio import new_event_loop, run_coroutine_threadsafe, Semaphore
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from inspect import iscoroutinefunction
+from threading import Thread
+from typing import Callable
+import numpy as np
+
+class Evaluator(ABC):
+    def __init__(self, workers:int = 1) -> None:
+        # number of evaluations that can run at the same time
+        self.workers = workers
+
+    @abstractmethod
+    def submit(self, f:Callable, solution:list[float]) -> Future:
+        """start evaluating f(solution)
+        """
+        pass
+
+    def map(self, f:Callable, solutions:np.ndarray) -> np.ndarray:
+        """evaluate f on every row of solutions, results keep the row order
+        """
+        futures = [self.submit(f, x) for x in solutions]
+        return np.fromiter((future.result() for future in futures), dtype=np.float64, count=len(futures))
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Evaluator":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+class SerialEvaluator(Evaluator):
+    def __init__(self) -> None:
+        """evaluate in the calling thread, the futures are already done
+        """
+        super().__init__(1)
+
+    def submit(self, f:Callable, solution:list[float]) -> Future:
+        future = Future()
+        try:
+            future.set_result(f(solution))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+class ThreadPoolEvaluator(Evaluator):
+    def __init__(self, workers:int) -> None:
+        """for objectives that release the GIL, e.g. I/O or native code
+        """
+        super().__init__(workers)
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def submit(self, f:Callable, solution:list[float]) -> Future:
+        return self.executor.submit(f, solution)
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+class ProcessPoolEvaluator(Evaluator):
+    def __init__(self, workers:int, chunksize:int = 1) -> None:
+        """for CPU-bound pure Python objectives, f must be picklable
+        """
+        super().__init__(workers)
+        self.chunksize = chunksize
+        self.executor = ProcessPoolExecutor(max_workers=workers)
+
+    def submit(self, f:Callable, solution:list[float]) -> Future:
+        return self.executor.submit(f, solution)
+
+    def map(self, f:Callable, solutions:np.ndarray) -> np.ndarray:
+        results = self.executor.map(f, list(solutions), chunksize=self.chunksize)
+        return np.fromiter(results, dtype=np.float64, count=len(solutions))
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+class AsyncioEvaluator(Evaluator):
+    def __init__(self, workers:int) -> None:
+        """run coroutine objectives (async def) on an event loop in a
+        background thread, at most workers of them at a time; plain
+        functions are run in the loop's default executor
+        """
+        super().__init__(workers)
+        self.loop = new_event_loop()
+        self.thread = Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.semaphore:Semaphore = run_coroutine_threadsafe(self._semaphore(), self.loop).result()
+
+    async def _semaphore(self) -> Semaphore:
+        # created inside the loop it is used in
+        return Semaphore(self.workers)
+
+    async def _evaluate(self, f:Callable, solution:list[float]) -> float:
+        async with self.semaphore:
+            if iscoroutinefunction(f):
+                return await f(solution)
+            return await self.loop.run_in_executor(None, f, solution)
+
+    def submit(self, f:Callable, solution:list[float]) -> Future:
+        return run_coroutine_threadsafe(self._evaluate(f, solution), self.loop)
+
+    def close(self) -> None:
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
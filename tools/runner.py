@@ -0,0 +1,154 @@
+"""runner.py multi-seed experiments over a process pool
+
+every run is one (algorithm, instance, seed) triple solved by a fresh solver
+that owns its random streams, so runs are independent of the worker they land on
+"""
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from typing import Any
+import numpy as np
+from tests.tsp import DirectedWeightedGraph
+from tools.sharedMemory import SharedGraph
+from algs.solver import Termination
+
+# problem instances of the current process, shipped once per worker,
+# graphs are attached from shared memory
+_instances:dict[str, Any] = {}
+
+def _initWorker(instances:dict[str, Any]) -> None:
+    global _instances
+    _instances = {
+        name: problem.attach() if isinstance(problem, SharedGraph) else problem
+        for name, problem in instances.items()
+    }
+
+class RunResult:
+    def __init__(
+            self,
+            algorithm:str,
+            instance:str,
+            seed:int,
+            best:float,
+            solution:list,
+            elapsed:float,
+            trace:list[tuple[float, float]],
+            timeToTarget:float
+        ) -> None:
+        self.algorithm = algorithm
+        self.instance = instance
+        self.seed = seed
+        self.best = best
+        self.solution = solution
+        self.elapsed = elapsed
+        # best value after every generation with the elapsed seconds
+        self.trace = trace
+        # seconds until the target was reached, None if it never was
+        self.timeToTarget = timeToTarget
+
+def timeToTarget(trace:list[tuple[float, float]], target:float, minimize:bool = True) -> float:
+    """return the elapsed seconds of the first trace entry reaching target,
+    or None
+    """
+    for elapsed, best in trace:
+        if (best <= target) if minimize else (best >= target):
+            return elapsed
+    return None
+
+def _run(task:tuple) -> RunResult:
+    algorithm, solverClass, kwargs, instance, seed, target, termination = task
+    problem = _instances[instance]
+    solver = solverClass(problem, rdSeed=seed, **kwargs)
+    start = perf_counter()
+    solver.run(termination)
+    elapsed = perf_counter() - start
+    # TSP solvers keep a tour, function optimizers a point
+    if hasattr(solver, "gBestLength"):
+        best, solution = solver.gBestLength, solver.gBestTour
+    else:
+        best, solution = solver.gBestVal, solver.gBest
+    trace = getattr(solver, "trace", [])
+    reached = None
+    if target is not None:
+        reached = timeToTarget(trace, target, getattr(problem, "minimize", True))
+    return RunResult(algorithm, instance, seed, float(best), solution, elapsed, trace, reached)
+
+class Runner:
+    def __init__(
+            self,
+            algorithms:dict[str, tuple[type, dict]],
+            instances:dict[str, Any],
+            seeds:list[int],
+            targets:dict[str, float] = None,
+            workers:int = None,
+            termination:Termination = None
+        ) -> None:
+        """run every algorithm on every instance once per seed, algorithms
+        map a name to a solver class and its keyword arguments, targets map
+        an instance name to the value time-to-target is measured against;
+        termination, e.g. a TimeLimit for equal budgets, replaces every
+        solver's own maxGeneration bound
+        """
+        self.algorithms = algorithms
+        self.instances = instances
+        self.seeds = seeds
+        self.targets = targets if targets is not None else {}
+        # None for one worker per CPU, 1 to run in this process
+        self.workers = workers
+        self.termination = termination
+        # result
+        self.results:list[RunResult] = []
+
+    def run(self) -> list[RunResult]:
+        tasks = [
+            (algorithm, solverClass, kwargs, instance, seed, self.targets.get(instance), self.termination)
+            for instance in self.instances
+            for algorithm, (solverClass, kwargs) in self.algorithms.items()
+            for seed in self.seeds
+        ]
+        if self.workers == 1:
+            _initWorker(self.instances)
+            self.results = [_run(task) for task in tasks]
+        else:
+            # graphs go to the workers through shared memory, lazy ones as
+            # their points and neighbor lists only
+            shared = {
+                name: SharedGraph(problem) if isinstance(problem, DirectedWeightedGraph) else problem
+                for name, problem in self.instances.items()
+            }
+            try:
+                with ProcessPoolExecutor(max_workers=self.workers, initializer=_initWorker, initargs=(shared,)) as executor:
+                    self.results = list(executor.map(_run, tasks))
+            finally:
+                for problem in shared.values():
+                    if isinstance(problem, SharedGraph):
+                        problem.close()
+        return self.results
+
+    def summary(self) -> dict[tuple[str, str], dict[str, float]]:
+        """return best, mean and std of the final values, the mean run time,
+        the success rate and the mean time-to-target of the successful runs
+        per (algorithm, instance)
+        """
+        groups:dict[tuple[str, str], list[RunResult]] = {}
+        for r in self.results:
+            groups.setdefault((r.algorithm, r.instance), []).append(r)
+        summary = {}
+        for (algorithm, instance), runs in groups.items():
+            values = np.array([r.best for r in runs])
+            minimize = getattr(self.instances[instance], "minimize", True)
+            reached = [r.timeToTarget for r in runs if r.timeToTarget is not None]
+            summary[(algorithm, instance)] = {
+                "best": float(values.min() if minimize else values.max()),
+                "mean": float(values.mean()),
+                "std": float(values.std(ddof=1)) if len(values) > 1 else 0.0,
+                "time": float(np.mean([r.elapsed for r in runs])),
+                "success": len(reached) / len(runs),
+                "timeToTarget": float(np.mean(reached)) if len(reached) != 0 else None
+            }
+        return summary
+
+    def printSummary(self) -> None:
+        print(f"{'algorithm':<12}{'instance':<12}{'best':>14}{'mean':>14}{'std':>12}{'time':>10}{'success':>9}{'ttt':>10}")
+        for (algorithm, instance), s in self.summary().items():
+            ttt = "-" if s["timeToTarget"] is None else f"{s['timeToTarget']:.3f}"
+            print(f"{algorithm:<12}{instance:<12}{s['best']:>14.4f}{s['mean']:>14.4f}{s['std']:>12.4f}{s['time']:>10.3f}{s['success']:>9.2f}{ttt:>10}")
@@ -0,0 +1,111 @@
+"""sharedMemory.py numpy arrays in multiprocessing.shared_memory
+
+the owner creates a segment once, every other process attaches to it by name,
+so pickling a SharedArray or a SharedGraph only sends a small handle
+"""
+from multiprocessing.shared_memory import SharedMemory
+from os import getpid
+from weakref import finalize
+import numpy as np
+from tests.tsp import CoordinateGraph, DirectedWeightedGraph
+
+def _release(shm:SharedMemory, owner:int) -> None:
+    try:
+        shm.close()
+    except BufferError:
+        # views of the segment are still alive, the mapping goes with the process
+        pass
+    # forked children inherit the owner's objects but must not unlink
+    if owner == getpid():
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+class SharedArray:
+    def __init__(self, shape:tuple, dtype:type = np.float64, name:str = None) -> None:
+        """create a new segment of the given shape, or attach to the segment
+        called name; only the creator unlinks the segment
+        """
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = name is None
+        if self.owner:
+            size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+            self.shm = SharedMemory(create=True, size=size)
+        else:
+            # child processes share the owner's resource tracker, so
+            # attaching does not hand the unlinking over to them
+            self.shm = SharedMemory(name=name)
+        self.name = self.shm.name
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=self.shm.buf)
+        self._finalizer = finalize(self, _release, self.shm, getpid() if self.owner else None)
+
+    @classmethod
+    def fromArray(cls, array:np.ndarray) -> "SharedArray":
+        """copy array into a new segment
+        """
+        shared = cls(array.shape, array.dtype)
+        shared.array[...] = array
+        return shared
+
+    def __reduce__(self) -> tuple:
+        # other processes attach instead of receiving a copy
+        return (SharedArray, (self.shape, self.dtype, self.name))
+
+    def close(self) -> None:
+        """detach this process, the owner also frees the segment
+        """
+        self.array = None
+        self._finalizer()
+
+    def __enter__(self) -> "SharedArray":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+class SharedGraph:
+    def __init__(self, graph:DirectedWeightedGraph) -> None:
+        """place the distance matrix, and the coordinates if any, of graph
+        in shared memory, pass the SharedGraph to worker processes and call
+        attach() there; a CoordinateGraph shares only its points and
+        neighbor lists and stays lazy in the workers
+        """
+        self.lazy = isinstance(graph, CoordinateGraph)
+        self.distance:SharedArray = None
+        self.neighbors:SharedArray = None
+        if self.lazy:
+            self.neighbors = SharedArray.fromArray(graph.neighbors)
+        else:
+            self.distance = SharedArray.fromArray(graph.distance)
+        self.points = None if graph.points is None else SharedArray.fromArray(graph.points)
+
+    @staticmethod
+    def _readOnly(shared:SharedArray) -> np.ndarray:
+        array = shared.array.view()
+        array.flags.writeable = False
+        return array
+
+    def attach(self) -> DirectedWeightedGraph:
+        """return a read-only graph backed by the shared segments
+        """
+        points = None if self.points is None else self._readOnly(self.points)
+        if self.lazy:
+            graph = CoordinateGraph.fromNeighbors(points, self._readOnly(self.neighbors))
+        else:
+            graph = DirectedWeightedGraph.fromArray(self._readOnly(self.distance), points)
+        # the segments stay mapped as long as the graph viewing them lives
+        graph._shared = self
+        return graph
+
+    def close(self) -> None:
+        for shared in (self.distance, self.neighbors, self.points):
+            if shared is not None:
+                shared.close()
+
+    def __enter__(self) -> "SharedGraph":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()